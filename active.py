@@ -0,0 +1,73 @@
+import numpy as np
+from array_simulation import EMPTY, AIR
+
+# active set of the array engine
+# the tile is cut into blocks of BLOCK x BLOCK cells, a block is active when units can interact in it:
+# the block and the cells up to RADIUS cells around it hold an air unit or units of two different factions
+# the cells of the other blocks are quiescent, their units have no enemy in reach and no air unit can reach them
+# in this round, so they take no damage, attack nobody and only heal, which resolve_healing does in bulk
+#
+# the blocks are found from the faction frame of the movement exchange, so the units of the neighbour tiles
+# are seen too, and the stencils of the movement and attack phases only run on the windows of the active blocks
+
+# side of the blocks in cells, at least RADIUS, 0 plays every phase on the whole tile
+BLOCK = 16
+
+# reach of a unit in one round, the air unit moves 1 cell and attacks 2 cells away
+RADIUS = 3
+
+# one bit per faction code, empty cells and cells outside of the battlefield have none
+FACTION_BITS = np.array([0, 1, 2, 4, 8], dtype=np.uint8)
+
+
+# local block edges along an axis of the given size, the last block takes the remainder
+# so every block is at least BLOCK cells wide unless the whole axis is shorter
+def block_edges(size):
+    count = max(size // BLOCK, 1)
+    return [i * BLOCK for i in range(count)] + [size]
+
+
+# windows of the active blocks as (row slice, column slice) of the local cells
+# faction is the haloed faction frame of the tile with at least RADIUS ghost cells
+# every row of blocks gives the span from its first to its last active block, rows with the same span are merged
+def active_windows(faction, depth):
+    rows = faction.shape[0] - 2 * depth
+    columns = faction.shape[1] - 2 * depth
+    if BLOCK == 0:
+        return [(slice(0, rows), slice(0, columns))]
+
+    # faction bits of the blocks, the RADIUS wide ghost strips around the tile are blocks of their own
+    margin = depth - RADIUS
+    frame = faction[margin:margin + rows + 2 * RADIUS, margin:margin + columns + 2 * RADIUS]
+    bits = FACTION_BITS[np.maximum(frame, EMPTY)]
+    row_edges, column_edges = block_edges(rows), block_edges(columns)
+    blocks = np.bitwise_or.reduceat(bits, [0] + [edge + RADIUS for edge in row_edges], axis=0)
+    blocks = np.bitwise_or.reduceat(blocks, [0] + [edge + RADIUS for edge in column_edges], axis=1)
+
+    # every block sees the blocks around it, they cover the RADIUS cells around the block
+    padded = np.pad(blocks, 1)
+    seen = np.zeros(blocks.shape, dtype=np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            seen |= padded[dy:dy + blocks.shape[0], dx:dx + blocks.shape[1]]
+    seen = seen[1:-1, 1:-1]
+    active = ((seen & FACTION_BITS[AIR]) > 0) | ((seen & (seen - 1)) > 0)
+
+    windows = []
+    span = None
+    for k, row in enumerate(active):
+        chosen = np.flatnonzero(row)
+        row_span = (column_edges[chosen[0]], column_edges[chosen[-1] + 1]) if len(chosen) else None
+        if row_span is not None and row_span == span and windows[-1][0].stop == row_edges[k]:
+            windows[-1] = (slice(windows[-1][0].start, row_edges[k + 1]), windows[-1][1])
+        elif row_span is not None:
+            windows.append((slice(row_edges[k], row_edges[k + 1]), slice(*row_span)))
+        span = row_span
+    return windows
+
+
+# slices of a haloed frame holding the window of local cells with its depth ghost cells
+def framed(window, depth):
+    rows, columns = window
+    return slice(rows.start, rows.stop + 2 * depth), slice(columns.start, columns.stop + 2 * depth)
+
@@ -0,0 +1,139 @@
+import numpy as np
+import events
+import timing
+from array_simulation import EMPTY, AIR, WATER, ATTACK, SKIP, FACTION_NAMES
+from stencils import MOVE_PATTERN, FIRE_PATTERN, adjacent_attacks, fire_kills, air_moves, air_attacks, flood_spawns, \
+    attack_targets
+from active import active_windows, framed
+
+# round phases of the array engine, they work on the typed columns of an ArrayGrid
+# and exchange typed halos with the neighbour processors (see halo.Halo) instead of Grid objects
+
+# halo depths of the phases, the air unit moves 1 cell and attacks 2 cells away
+MOVEMENT_DEPTH = 3
+ARRIVAL_DEPTH = 1
+ATTACK_DEPTH = 2
+RAGE_DEPTH = 1
+FLOOD_DEPTH = 2
+
+
+# move every air unit to the reachable cell from which it can attack the most enemies
+# returns the windows of the active blocks of the round (see active.py), every air unit is inside of them
+def move_air_units(grid, halo, debug):
+    depth = MOVEMENT_DEPTH
+    faction = halo.exchange([grid.faction], depth, np.int8)[0]
+    windows = active_windows(faction, depth)
+
+    moves = np.zeros(grid.faction.shape, dtype=np.intp)
+    for window in windows:
+        moves[window] = air_moves(faction[framed(window, depth)], depth)
+    departures = grid.faction == AIR
+    y, x = np.nonzero(departures)
+    move = np.array(MOVE_PATTERN)[moves[y, x]]
+    if events.LOG is not None:
+        x_from, y_from = x + grid.offset_x, y + grid.offset_y
+        events.LOG.record_many(events.MOVE, AIR, x_from, y_from, x_from + move[:, 0], y_from + move[:, 1], hp=grid.hp[y, x])
+    if debug:
+        for i in range(len(y)):
+            print("🛫 unit:", grid.describe(x[i], y[i]), "moved to x,y :",
+                  x[i] + move[i, 0] + grid.offset_x, y[i] + move[i, 1] + grid.offset_y)
+
+    # collect the count, hp and attack of the arriving units per cell, units leaving
+    # the subgrid land in the ghost cells and are added to the neighbours' cells
+    arrivals = halo.zeros(ARRIVAL_DEPTH, 3)
+    target = (y + move[:, 1] + ARRIVAL_DEPTH, x + move[:, 0] + ARRIVAL_DEPTH)
+    np.add.at(arrivals[0], target, 1)
+    np.add.at(arrivals[1], target, grid.hp[y, x])
+    np.add.at(arrivals[2], target, grid.attack[y, x])
+    arrivals = halo.accumulate(arrivals, ARRIVAL_DEPTH)
+    grid.resolve_movement(departures, arrivals, debug)
+    return windows
+
+
+# every unit that decides to attack damages the enemies in its attack pattern
+# attacks are stencils over the haloed columns: each processor computes the damage
+# its own cells receive, also from the attackers in the halo, so no damage is sent
+# returns the total damage per local cell and the fire targets (see stencils.adjacent_attacks)
+# the stencils only run on the given windows of local cells, the whole subgrid when windows is None,
+# the cells outside of them take no damage and attack nobody
+def attack(grid, halo, debug, windows=None):
+    depth = ATTACK_DEPTH
+    frame = halo.exchange([grid.faction, grid.hp, grid.attack], depth)
+
+    damage = np.zeros(grid.faction.shape, dtype=np.int32)
+    attacked = np.zeros(grid.faction.shape, dtype=bool)
+    fire_targets = np.zeros((len(FIRE_PATTERN),) + grid.faction.shape, dtype=bool)
+    if windows is None:
+        windows = [(slice(0, grid.height), slice(0, grid.size))]
+    for window in windows:
+        faction, hp, attack_power = frame[(slice(None),) + framed(window, depth)]
+        window_damage, window_attacked, fire_targets[(slice(None),) + window] = adjacent_attacks(faction, hp, attack_power, depth)
+        air_damage, air_attacked = air_attacks(faction, hp, attack_power, depth)
+        damage[window] = window_damage + air_damage
+        attacked[window] = window_attacked | air_attacked
+    decision = grid.decide()
+    if events.LOG is not None:
+        # like the object engine, one attack event per target and the units that skip the attack phase
+        # are recorded as not attacking too
+        for window in windows:
+            faction, hp = frame[(slice(0, 2),) + framed(window, depth)]
+            for attackers, dx, dy in attack_targets(faction, hp, depth):
+                mask = np.zeros(grid.faction.shape, dtype=bool)
+                mask[window] = attackers
+                grid.record(events.ATTACK, mask, step=(dx, dy))
+        grid.record(events.NO_ATTACK, (grid.faction > EMPTY) & ~((decision == ATTACK) & attacked))
+
+    # if the unit is not attacking, then it skips the attack phase to heal
+    if debug:
+        for y, x in np.argwhere(decision == ATTACK):
+            if attacked[y, x]:
+                print("🎯 unit:", grid.describe(x, y), "⚔️ decided to attack")
+            else:
+                print("🚫 unit:", grid.describe(x, y), "didn't attack.")
+    grid.decision = np.where(attacked, decision, SKIP).astype(np.int8)
+    return damage, fire_targets
+
+
+# increase the attack power of the fire units for every attacked enemy that died
+def rage(grid, died, fire_targets, halo, debug):
+    depth = RAGE_DEPTH
+    died = halo.exchange([died], depth, np.int8)[0] == 1
+    grid.resolve_rage(fire_kills(fire_targets, died, depth), debug)
+
+
+# play one round of the simulation on the subgrid of this processor
+# the phases only sync with the neighbour processors through their halo exchanges
+# the movement and attack stencils only run on the active blocks found by the movement phase (see active.py)
+# with the phase timers on, every phase ends with a lap of its timer (see timing.py)
+def play_round(grid, halo, debug):
+    timer = timing.TIMER
+    windows = move_air_units(grid, halo, debug)
+    if timer is not None:
+        timer.lap("array movement")
+    damage, fire_targets = attack(grid, halo, debug, windows)
+    if timer is not None:
+        timer.lap("array attack")
+    died = grid.resolve_damage(damage, debug)
+    grid.resolve_healing(debug)
+    if timer is not None:
+        timer.lap("array resolution")
+    rage(grid, died, fire_targets, halo, debug)
+    if timer is not None:
+        timer.lap("array rage")
+
+
+# water units flood the first empty neighbour cell at the end of the wave
+# each processor finds the spawns on its own cells, also from the water units in the halo
+def flood(grid, halo, debug):
+    depth = FLOOD_DEPTH
+    faction = halo.exchange([grid.faction], depth, np.int8)[0]
+
+    spawns = flood_spawns(faction, depth)
+    grid.spawn(WATER, spawns)
+    if events.LOG is not None:
+        grid.record(events.SPAWN, spawns)
+    if debug:
+        for y, x in np.argwhere(spawns):
+            print(f"💧 {FACTION_NAMES[WATER]} unit at ({x + grid.offset_x}, {y + grid.offset_y}) has spawned")
+    if timing.TIMER is not None:
+        timing.TIMER.lap("array flood")
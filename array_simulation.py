@@ -0,0 +1,287 @@
+import numpy as np
+import events
+from simulation import Grid, UNIT_CLASSES
+
+# faction codes stored in the faction column, 0 marks an empty cell
+EMPTY = 0
+EARTH = 1
+FIRE = 2
+WATER = 3
+AIR = 4
+
+# faction code used for the cells outside of the battlefield in haloed arrays
+OUTSIDE = -1
+
+# decision codes stored in the decision column
+SKIP = 0
+ATTACK = 1
+
+# faction names and codes used to convert between the object and array representations
+FACTION_NAMES = ["", "Earth", "Fire", "Water", "Air"]
+FACTION_CODES = {"E": EARTH, "F": FIRE, "W": WATER, "A": AIR,
+                 "Earth": EARTH, "Fire": FIRE, "Water": WATER, "Air": AIR}
+
+# per faction attributes indexed by the faction code
+MAXIMUM_HP = np.array([0, 18, 12, 14, 10], dtype=np.int16)
+BASE_ATTACK = np.array([0, 2, 4, 3, 2], dtype=np.int32)
+HEAL = np.array([0, 3, 1, 2, 2], dtype=np.int8)
+THRESHOLD = np.array([0, 9, 6, 7, 5], dtype=np.int8)
+
+# fire units stop raging at this attack power
+FIRE_MAXIMUM_ATTACK = 6
+
+# display characters indexed by the faction code
+DISPLAY_CHARS = np.array([".", "E", "F", "W", "A"])
+DISPLAY_BYTES = np.frombuffer(b".EFWA", dtype=np.uint8)
+
+FACTION_EMOJIS = ["", "🌍", "🔥", "💧", "🛩️"]
+
+
+# array grid class keeps the units of a grid as typed per-cell columns (structure of arrays)
+# instead of an object array of Unit instances, every column has the (height, size) shape of the grid
+class ArrayGrid:
+
+    # initialize the grid with the given size and offset
+    # size is the number of columns, the grid is square unless the number of rows is given as height
+    def __init__(self, size, offset_x=0, offset_y=0, height=None):
+        self.size = size
+        self.height = size if height is None else height
+        # offset is used to keep track of the global coordinates of the grid
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+        shape = (self.height, size)
+        self.faction = np.zeros(shape, dtype=np.int8)
+        self.hp = np.zeros(shape, dtype=np.int16)
+        self.attack = np.zeros(shape, dtype=np.int32)
+        self.heal = np.zeros(shape, dtype=np.int8)
+        self.threshold = np.zeros(shape, dtype=np.int8)
+        self.maximum_hp = np.zeros(shape, dtype=np.int16)
+        self.decision = np.zeros(shape, dtype=np.int8)
+        # number of attack power increases a fire unit gained in the current wave
+        self.rage = np.zeros(shape, dtype=np.int8)
+
+    # build an array grid from an object grid
+    @classmethod
+    def from_grid(cls, grid):
+        array_grid = cls(grid.get_size(), grid.offset_x, grid.offset_y, grid.height)
+        for unit in grid.get_all_units():
+            array_grid.place_unit(unit)
+        return array_grid
+
+    # build an object grid with the same units
+    def to_grid(self):
+        grid = Grid(self.size, self.offset_x, self.offset_y, height=self.height)
+        for y, x in np.argwhere(self.faction > EMPTY):
+            unit = UNIT_CLASSES[self.faction[y, x]](int(x) + self.offset_x, int(y) + self.offset_y, grid)
+            unit.hp = int(self.hp[y, x])
+            unit.attack = int(self.attack[y, x])
+        return grid
+
+    # convert global coordinates to local indices, None if they are out of bounds
+    def to_local(self, x, y):
+        x, y = x - self.offset_x, y - self.offset_y
+        if 0 <= x < self.size and 0 <= y < self.height:
+            return x, y
+        print(f"Error: Coordinates ({x + self.offset_x}, {y + self.offset_y}) are out of bounds.")
+        return None
+
+    # place a new unit of the given faction code on the grid
+    def place(self, faction, x, y):
+        local = self.to_local(x, y)
+        if local is None:
+            return
+        x, y = local
+        self.faction[y, x] = faction
+        self.hp[y, x] = MAXIMUM_HP[faction]
+        self.attack[y, x] = BASE_ATTACK[faction]
+        self.heal[y, x] = HEAL[faction]
+        self.threshold[y, x] = THRESHOLD[faction]
+        self.maximum_hp[y, x] = MAXIMUM_HP[faction]
+        self.decision[y, x] = SKIP
+        self.rage[y, x] = 0
+
+    # place a unit of the given faction code with its current hp and attack power on the grid
+    def place_state(self, faction, x, y, hp, attack):
+        self.place(faction, x, y)
+        local = self.to_local(x, y)
+        if local is not None:
+            x, y = local
+            self.hp[y, x] = hp
+            self.attack[y, x] = attack
+            if faction == FIRE:
+                self.rage[y, x] = attack - BASE_ATTACK[FIRE]
+
+    # place a copy of a Unit object on the grid
+    def place_unit(self, unit):
+        self.place_state(FACTION_CODES[unit.faction], unit.x, unit.y, unit.hp, unit.attack)
+
+    # place the units of a new wave on the empty cells, the first unit placed on a cell wins
+    # placements are (faction code, x, y) rows
+    def place_wave(self, placements):
+        for faction, x, y in placements:
+            if self.get_faction(x, y) == EMPTY:
+                self.place(faction, x, y)
+
+    # get the units as (faction code, x, y, hp, attack) rows in global coordinates,
+    # the compact state that moves between the workers when the battlefield is repartitioned
+    def unit_rows(self):
+        y, x = np.nonzero(self.faction > EMPTY)
+        return np.stack([self.faction[y, x], x + self.offset_x, y + self.offset_y,
+                         self.hp[y, x], self.attack[y, x]], axis=1).astype(np.int32)
+
+    # place the units of (faction code, x, y, hp, attack) rows on the grid
+    def place_rows(self, rows):
+        for faction, x, y, hp, attack in rows.tolist():
+            self.place_state(faction, x, y, hp, attack)
+
+    # get the faction code at the given global coordinates, EMPTY for out-of-bounds access
+    def get_faction(self, x, y):
+        x, y = x - self.offset_x, y - self.offset_y
+        if 0 <= x < self.size and 0 <= y < self.height:
+            return self.faction[y, x]
+        return EMPTY
+
+    # clear all the cells selected by the boolean mask
+    def clear(self, mask):
+        for column in self.columns():
+            column[mask] = 0
+
+    # get all the per-cell columns
+    def columns(self):
+        return [self.faction, self.hp, self.attack, self.heal, self.threshold,
+                self.maximum_hp, self.decision, self.rage]
+
+    # get the state that neighbours need to see, stacked as (faction, hp, attack)
+    def state(self):
+        return np.stack([self.faction, self.hp, self.attack]).astype(np.int32)
+
+    # get the size of the grid
+    def get_size(self):
+        return self.size
+
+    # get the number of units on the grid
+    def count_units(self):
+        return int(np.count_nonzero(self.faction))
+
+    # describe the unit at the given local indices like Unit.__str__ does
+    def describe(self, x, y):
+        faction = self.faction[y, x]
+        return (f"{FACTION_EMOJIS[faction]} {FACTION_NAMES[faction]} unit at ({x + self.offset_x}, {y + self.offset_y}) "
+                f"with 💙 {self.hp[y, x]} HP with attack power: {self.attack[y, x]}.")
+
+    # record an event for every unit on the cells selected by the mask (see events.py)
+    # value is an array of the cells or a scalar, step the (dx, dy) from the units to the targets of the events
+    def record(self, kind, mask, value=0, step=None):
+        y, x = np.nonzero(mask)
+        at_x, at_y = x + self.offset_x, y + self.offset_y
+        target = (at_x + step[0], at_y + step[1]) if step is not None else (-1, -1)
+        events.LOG.record_many(kind, self.faction[y, x], at_x, at_y, *target,
+                               value=value[y, x] if np.ndim(value) else value, hp=self.hp[y, x])
+
+    # display the grid
+    def display(self):
+        print("  " + " ".join(str(i + self.offset_x) for i in range(self.size)))
+        display_rows = [' '.join(row) for row in DISPLAY_CHARS[self.faction]]
+        for idx, row in enumerate(display_rows):
+            print(f"{idx + self.offset_y} {row}")
+        return display_rows
+
+    # encode the cells as their bytes of the output file, a (height, 2 * size) uint8 array
+    # every cell is its display character and a space, the last cell of a battlefield row ends the line instead
+    def encode(self, battlefield_width):
+        rows = np.full((self.height, 2 * self.size), ord(" "), dtype=np.uint8)
+        rows[:, 0::2] = DISPLAY_BYTES[self.faction]
+        if self.offset_x + self.size == battlefield_width:
+            rows[:, -1] = ord("\n")
+        return rows
+
+    # decide whether to attack or skip for every unit
+    def decide(self):
+        self.decision = np.where((self.faction > EMPTY) & (self.hp >= self.threshold), ATTACK, SKIP).astype(np.int8)
+        return self.decision
+
+    # place new units of the given faction code on the cells selected by the boolean mask
+    def spawn(self, faction, mask):
+        self.faction[mask] = faction
+        self.hp[mask] = MAXIMUM_HP[faction]
+        self.attack[mask] = BASE_ATTACK[faction]
+        self.heal[mask] = HEAL[faction]
+        self.threshold[mask] = THRESHOLD[faction]
+        self.maximum_hp[mask] = MAXIMUM_HP[faction]
+        self.decision[mask] = SKIP
+        self.rage[mask] = 0
+
+    # move the air units: clear the departing cells, then land the arrivals
+    # arrivals are the (count, hp, attack) sums of the air units landing on every cell,
+    # air units landing on the same cell upgrade
+    def resolve_movement(self, departures, arrivals, debug):
+        self.clear(departures)
+        count, hp, attack = arrivals
+
+        landed = count > 0
+        self.spawn(AIR, landed)
+        self.hp[landed] = np.minimum(hp[landed], MAXIMUM_HP[AIR])
+        self.attack[landed] = attack[landed]
+        if events.LOG is not None:
+            y, x = np.nonzero(count > 1)
+            upgrades = count[y, x] - 1
+            events.LOG.record_many(events.UPGRADE, AIR, np.repeat(x + self.offset_x, upgrades), np.repeat(y + self.offset_y, upgrades))
+        if debug:
+            for y, x in np.argwhere(count > 1):
+                for i in range(count[y, x] - 1):
+                    print(f"💪 Air unit at ({x + self.offset_x}, {y + self.offset_y}) upgraded.")
+
+    # resolve the damage of the units, damage is the total incoming damage per cell
+    # returns the mask of the units that died
+    def resolve_damage(self, damage, debug):
+        occupied = self.faction > EMPTY
+        # fortification halves the total damage taken by earth units
+        damage = np.where(self.faction == EARTH, damage // 2, damage)
+        self.hp -= damage.astype(self.hp.dtype)
+        died = occupied & (self.hp <= 0)
+        if events.LOG is not None:
+            self.record(events.DAMAGE, occupied & (damage > 0), value=damage)
+            self.record(events.DEATH, died)
+        if debug:
+            for y, x in np.argwhere(occupied & (damage > 0)):
+                print(f"🗡️ {FACTION_NAMES[self.faction[y, x]]} unit at ({x + self.offset_x}, {y + self.offset_y}) took 🩹 {damage[y, x]} damage. 💜 HP: {self.hp[y, x]}")
+            for y, x in np.argwhere(died):
+                print(f"💀 {FACTION_NAMES[self.faction[y, x]]} unit at ({x + self.offset_x}, {y + self.offset_y}) has died")
+        self.clear(died)
+        return died
+
+    # resolve the healing of the units that skipped, then reset every decision to skip
+    def resolve_healing(self, debug):
+        healing = (self.faction > EMPTY) & (self.decision == SKIP)
+        healed = np.minimum(self.hp + self.heal, self.maximum_hp)
+        self.hp = np.where(healing, healed, self.hp).astype(np.int16)
+        if events.LOG is not None:
+            self.record(events.HEAL, healing)
+        if debug:
+            for y, x in np.argwhere(healing):
+                print(f"😇 {FACTION_NAMES[self.faction[y, x]]} unit at ({x + self.offset_x}, {y + self.offset_y}) healing .... HP: {self.hp[y, x]}")
+        self.decision[:] = SKIP
+
+    # increase the attack power of the fire units by the number of enemies they killed
+    def resolve_rage(self, kills, debug):
+        fire = (self.faction == FIRE) & (kills > 0)
+        raged = np.minimum(self.attack + kills, FIRE_MAXIMUM_ATTACK)
+        if events.LOG is not None:
+            self.record(events.RAGE, fire & (raged > self.attack), value=raged)
+        if debug:
+            for y, x in np.argwhere(fire & (raged > self.attack)):
+                print(f"🔥 Fire unit at ({x + self.offset_x}, {y + self.offset_y}) increased attack power to {raged[y, x]}")
+        self.rage += np.where(fire, raged - self.attack, 0).astype(np.int8)
+        self.attack = np.where(fire, raged, self.attack).astype(np.int32)
+
+    # reset the attack power of the fire units
+    def reset_attack_power(self):
+        fire = self.faction == FIRE
+        self.attack[fire] = BASE_ATTACK[FIRE]
+        self.rage[fire] = 0
+
+    # override the string representation of the grid
+    def __str__(self):
+        self.display()
+        return ""
@@ -0,0 +1,304 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+from simulation import Grid
+from array_simulation import ArrayGrid, UNIT_CLASSES, EARTH, FIRE, WATER, AIR
+from array_engine import move_air_units, attack, rage, flood
+from serial_engine import LocalHalo
+from partition import Partition
+from utils import simulate_movement, get_air_attack_pattern, split_to_all, neighbor_relation, find_spawns, resolve_rage
+
+# micro-benchmarks of the round phases on synthetic tiles
+#
+# every case is a battlefield of 3 x 3 tiles of the given size with units on the given share of the cells,
+# the phases of the object engine run on the center tile with its 8 neighbour tiles as the neighbour subgrids,
+# so the lookups across the tile boundaries are measured too, the phases of the array engine run on one tile
+# every phase is timed alone on a fresh copy of the battlefield, the minimum and median of the repeats are kept
+#
+#   python benchmark.py                           # sweep and compare with benchmark_baseline.json
+#   python benchmark.py --save                    # sweep and save the results as the new baseline
+#   python benchmark.py --sizes 32 --phases resolve_damage array.attack
+
+SIZES = [16, 32, 64]
+DENSITIES = [0.05, 0.25, 0.5]
+
+# faction weights of the units (Earth, Fire, Water, Air)
+MIXES = {
+    "uniform": [1, 1, 1, 1],
+    "air": [1, 1, 1, 5],
+    "water": [1, 1, 5, 1],
+    "fire": [1, 5, 1, 1],
+}
+
+REPEAT = 5
+BASELINE = "benchmark_baseline.json"
+
+# a phase regressed when it is this much slower than the baseline and slower by at least MINIMUM_CHANGE seconds
+TOLERANCE = 0.25
+MINIMUM_CHANGE = 50e-6
+
+# the center tile belongs to the worker in the middle of the 3 x 3 layout
+CENTER = 5
+WORLD_SIZE = 10
+
+
+# synthetic battlefield of a case as int32 (faction code, x, y) rows
+def battlefield(size, density, mix, seed=0):
+    rng = np.random.default_rng(seed)
+    cells = 9 * size * size
+    chosen = rng.choice(cells, size=int(cells * density), replace=False)
+    weights = np.array(MIXES[mix], dtype=float)
+    factions = rng.choice([EARTH, FIRE, WATER, AIR], size=len(chosen), p=weights / weights.sum())
+    return np.stack([factions, chosen % (3 * size), chosen // (3 * size)], axis=1).astype(np.int32)
+
+
+# object grids of the 9 tiles, returns the partition, the center tile and its neighbour subgrids by relation index
+def object_tiles(size, placements):
+    partition = Partition.blocks(3 * size, 3 * size, 3, 3)
+    tiles = {}
+    for rank in range(1, WORLD_SIZE):
+        x, y, width, height = partition.tile(rank)
+        tiles[rank] = Grid(width, x, y, height=height)
+    for faction, x, y in placements.tolist():
+        UNIT_CLASSES[faction](x, y, tiles[partition.owner(x, y)])
+
+    neighbour_subgrids = [None] * 8
+    for rank, tile in tiles.items():
+        if rank != CENTER:
+            neighbour_subgrids[neighbor_relation(CENTER, rank, partition)] = tile
+    return partition, tiles[CENTER], neighbour_subgrids
+
+
+# array grid of the center tile
+def array_tile(size, placements):
+    grid = ArrayGrid(size, size, size)
+    inside = (placements[:, 1] >= size) & (placements[:, 1] < 2 * size) & (placements[:, 2] >= size) & (placements[:, 2] < 2 * size)
+    grid.place_wave(placements[inside].tolist())
+    return grid, LocalHalo((size, size))
+
+
+# the phases, every phase prepares a fresh state of the case and returns the call to time
+
+def phase_split_to_all(size, placements, rng):
+    partition, subgrid, neighbour_subgrids = object_tiles(size, placements)
+    return lambda: split_to_all(subgrid, [3] * 8)
+
+
+def phase_simulate_movement(size, placements, rng):
+    partition, subgrid, neighbour_subgrids = object_tiles(size, placements)
+    air_units = [unit for unit in subgrid.get_all_units() if unit.faction == "Air"]
+
+    def run():
+        for unit in air_units:
+            simulate_movement(unit, subgrid, neighbour_subgrids, CENTER, partition)
+    return run
+
+
+def phase_get_air_attack_pattern(size, placements, rng):
+    partition, subgrid, neighbour_subgrids = object_tiles(size, placements)
+    air_units = [unit for unit in subgrid.get_all_units() if unit.faction == "Air"]
+
+    def run():
+        for unit in air_units:
+            get_air_attack_pattern(unit, unit.x, unit.y, subgrid, neighbour_subgrids, CENTER, partition)
+    return run
+
+
+def phase_resolve_movement(size, placements, rng):
+    partition, subgrid, neighbour_subgrids = object_tiles(size, placements)
+    # every air unit moves to its best cell inside the tile
+    for unit in subgrid.get_all_units():
+        if unit.faction == "Air":
+            x, y = simulate_movement(unit, subgrid, neighbour_subgrids, CENTER, partition)[:2]
+            if partition.owner(x, y) == CENTER:
+                subgrid.enqueue_removal(unit, unit.x, unit.y)
+                subgrid.enqueue_movement(unit, x, y)
+    subgrid.resolve_removal()
+    return lambda: subgrid.resolve_movement(False)
+
+
+def phase_resolve_damage(size, placements, rng):
+    subgrid = object_tiles(size, placements)[1]
+    # about half of the units are hit by one to three attackers
+    for unit in subgrid.get_all_units():
+        for hit in range(rng.integers(0, 4) if rng.random() < 0.5 else 0):
+            subgrid.enqueue(unit, int(rng.integers(2, 7)))
+    return lambda: subgrid.resolve_damage(False)
+
+
+def phase_resolve_healing(size, placements, rng):
+    subgrid = object_tiles(size, placements)[1]
+    for unit in subgrid.get_all_units():
+        unit.decision = "Attack" if rng.random() < 0.5 else "Skip"
+    return lambda: subgrid.resolve_healing(False)
+
+
+def phase_find_spawns(size, placements, rng):
+    partition, subgrid, neighbour_subgrids = object_tiles(size, placements)
+    return lambda: find_spawns(subgrid, neighbour_subgrids, CENTER, partition)
+
+
+def phase_resolve_rage(size, placements, rng):
+    subgrid = object_tiles(size, placements)[1]
+    # every fire unit attacked its neighbours, a quarter of the cells of the tile and its neighbours died
+    cells = [(x, y) for x in range(size - 1, 2 * size + 1) for y in range(size - 1, 2 * size + 1)]
+    deaths = [cell for cell in cells if rng.random() < 0.25]
+    for unit in subgrid.get_all_units():
+        if unit.faction == "Fire":
+            unit.attacked_to = unit.get_attack_pattern()
+    subgrid.death_queue = [cell for cell in deaths if size <= cell[0] < 2 * size and size <= cell[1] < 2 * size]
+    neighbour_deaths = [[cell for cell in deaths if cell not in subgrid.death_queue]] + [[] for i in range(7)]
+    return lambda: resolve_rage(subgrid, neighbour_deaths, False)
+
+
+def phase_array_move_air_units(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    return lambda: move_air_units(grid, halo, False)
+
+
+def phase_array_attack(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    move_air_units(grid, halo, False)
+    return lambda: attack(grid, halo, False)
+
+
+def phase_array_resolve_damage(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    move_air_units(grid, halo, False)
+    damage = attack(grid, halo, False)[0]
+    return lambda: grid.resolve_damage(damage, False)
+
+
+def phase_array_resolve_healing(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    move_air_units(grid, halo, False)
+    damage = attack(grid, halo, False)[0]
+    grid.resolve_damage(damage, False)
+    return lambda: grid.resolve_healing(False)
+
+
+def phase_array_rage(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    move_air_units(grid, halo, False)
+    damage, fire_targets = attack(grid, halo, False)
+    died = grid.resolve_damage(damage, False)
+    grid.resolve_healing(False)
+    return lambda: rage(grid, died, fire_targets, halo, False)
+
+
+def phase_array_flood(size, placements, rng):
+    grid, halo = array_tile(size, placements)
+    return lambda: flood(grid, halo, False)
+
+
+PHASES = {
+    "resolve_damage": phase_resolve_damage,
+    "resolve_healing": phase_resolve_healing,
+    "resolve_movement": phase_resolve_movement,
+    "simulate_movement": phase_simulate_movement,
+    "get_air_attack_pattern": phase_get_air_attack_pattern,
+    "split_to_all": phase_split_to_all,
+    "find_spawns": phase_find_spawns,
+    "resolve_rage": phase_resolve_rage,
+    "array.move_air_units": phase_array_move_air_units,
+    "array.attack": phase_array_attack,
+    "array.resolve_damage": phase_array_resolve_damage,
+    "array.resolve_healing": phase_array_resolve_healing,
+    "array.rage": phase_array_rage,
+    "array.flood": phase_array_flood,
+}
+
+
+# time a phase of a case, every repeat runs on a fresh state
+def measure(phase, size, density, mix, repeat):
+    placements = battlefield(size, density, mix)
+    times = []
+    for i in range(repeat):
+        run = PHASES[phase](size, placements, np.random.default_rng(i))
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return {"min": min(times), "median": float(np.median(times)), "units": len(placements)}
+
+
+# key of a case in the results
+def case_key(phase, size, density, mix):
+    return f"{phase}/{size}/{density}/{mix}"
+
+
+# run the sweep and return the results keyed by case
+def sweep(phases, sizes, densities, mixes, repeat):
+    results = {}
+    for phase in phases:
+        for size in sizes:
+            for density in densities:
+                for mix in mixes:
+                    results[case_key(phase, size, density, mix)] = measure(phase, size, density, mix, repeat)
+    return results
+
+
+# get the cases that are slower than in the baseline, as (key, baseline time, time) tuples
+def regressions(results, baseline, tolerance=TOLERANCE):
+    slower = []
+    for key, result in results.items():
+        if key in baseline:
+            before, after = baseline[key]["min"], result["min"]
+            if after > before * (1 + tolerance) and after - before > MINIMUM_CHANGE:
+                slower.append((key, before, after))
+    return slower
+
+
+# print the results next to the baseline
+def report(results, baseline):
+    print(f"{'case':<55} {'min ms':>10} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for key, result in results.items():
+        line = f"{key:<55} {1e3 * result['min']:>10.3f} {1e3 * result['median']:>10.3f}"
+        if key in baseline:
+            before = baseline[key]["min"]
+            line += f" {1e3 * before:>10.3f} {100 * (result['min'] / max(before, 1e-12) - 1):>+7.1f}%"
+        print(line)
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results, repeat):
+    with open(path, "w") as f:
+        json.dump({"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                   "repeat": repeat, "results": results}, f, indent=1)
+
+
+# run the sweep from the command line, exits with 1 when a phase regressed against the baseline
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Micro-benchmarks of the round phases.")
+    arguments.add_argument("--phases", nargs="+", default=list(PHASES), choices=list(PHASES))
+    arguments.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    arguments.add_argument("--densities", nargs="+", type=float, default=DENSITIES)
+    arguments.add_argument("--mixes", nargs="+", default=list(MIXES), choices=list(MIXES))
+    arguments.add_argument("--repeat", type=int, default=REPEAT)
+    arguments.add_argument("--baseline", default=BASELINE)
+    arguments.add_argument("--tolerance", type=float, default=TOLERANCE)
+    arguments.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    options = arguments.parse_args()
+
+    baseline = load_baseline(options.baseline)
+    results = sweep(options.phases, options.sizes, options.densities, options.mixes, options.repeat)
+    report(results, baseline)
+
+    if options.save:
+        save_baseline(options.baseline, results, options.repeat)
+        print(f"💾 Saved the baseline to {options.baseline}")
+        sys.exit(0)
+
+    slower = regressions(results, baseline, options.tolerance)
+    for key, before, after in slower:
+        print(f"🐢 {key} regressed: {1e3 * before:.3f} ms -> {1e3 * after:.3f} ms")
+    sys.exit(1 if slower else 0)
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from mpi4py import MPI
+
+# checkpoints of the battlefield between waves and rounds
+#
+#   magic      8 bytes  b"PGBCKP01"
+#   header     int64    grid size, wave, round, unit count
+#   units      int32    (unit count, 5) rows of faction code, x, y, hp, attack
+#
+# the run resumes at the given round of the given wave, round 0 is the start of the wave before its units are placed
+# the units are in global coordinates, so a checkpoint can be restored on any worker layout
+# the rage of a fire unit is its attack above the base attack and the decisions are made again every round,
+# so the rows are the whole state of the units between two rounds
+
+MAGIC = b"PGBCKP01"
+HEADER_FIELDS = 4
+UNIT_FIELDS = 5
+HEADER_SIZE = len(MAGIC) + 8 * HEADER_FIELDS
+
+
+# write the (faction code, x, y, hp, attack) rows of the units of every worker into one checkpoint with collective
+# MPI-IO writes at the offsets of the workers, workers is the communicator of the worker processes
+# the checkpoint is written to a partial file that replaces the last checkpoint once it is complete
+def write_checkpoint(workers, units, grid_size, wave, round, path):
+    units = np.ascontiguousarray(units, dtype=np.int32)
+    before = workers.exscan(len(units)) or 0
+    total = workers.allreduce(len(units))
+
+    partial = path + ".partial"
+    fh = MPI.File.Open(workers, partial, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+    fh.Set_size(HEADER_SIZE + 4 * UNIT_FIELDS * total)
+    header = np.empty(0, dtype=np.uint8)
+    if workers.Get_rank() == 0:
+        header = np.frombuffer(MAGIC + np.array([grid_size, wave, round, total], dtype=np.int64).tobytes(), dtype=np.uint8)
+    fh.Write_at_all(0, [header, MPI.BYTE])
+    fh.Write_at_all(HEADER_SIZE + 4 * UNIT_FIELDS * before, [units, MPI.INT])
+    fh.Close()
+
+    if workers.Get_rank() == 0:
+        os.replace(partial, path)
+
+
+# read a checkpoint, returns the grid size, wave, round and the memory mapped unit rows
+def read_checkpoint(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint.")
+        grid_size, wave, round, count = (int(value) for value in np.fromfile(f, dtype=np.int64, count=HEADER_FIELDS))
+    units = np.memmap(path, dtype=np.int32, mode="r", offset=HEADER_SIZE, shape=(count, UNIT_FIELDS)) if count else \
+        np.empty((0, UNIT_FIELDS), dtype=np.int32)
+    return grid_size, wave, round, units
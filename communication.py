@@ -1,3 +1,8 @@
+import time
+import numpy as np
+from mpi4py import MPI
+import timing
+
 
 # communicate function is used to communicate between processors in a 2D grid
 
@@ -28,7 +33,24 @@
 
 # odd processors send first then receive. 
 
-def communicate(from_list, to_list, rank, sqrt_p, comm):
+# if the cartesian topology of the workers is given (see topology.Topology), all 8 directions
+# are exchanged in one neighbourhood collective instead of the odd/even protocol
+
+# with the phase timers on, the time spent in the exchange is added to the "communicate" phase (see timing.py)
+def communicate(from_list, to_list, rank, sqrt_p, comm, topology=None):
+    if timing.TIMER is None:
+        return exchange(from_list, to_list, rank, sqrt_p, comm, topology)
+    started = time.perf_counter()
+    from_list = exchange(from_list, to_list, rank, sqrt_p, comm, topology)
+    timing.TIMER.add("communicate", time.perf_counter() - started)
+    return from_list
+
+
+# exchange the lists of communicate with the 8 neighbours
+def exchange(from_list, to_list, rank, sqrt_p, comm, topology=None):
+
+    if topology is not None:
+        return communicate_neighbours(from_list, to_list, topology)
     
     # if there is only one processor, no communication is needed
     world_size = comm.Get_size()
@@ -251,4 +273,56 @@ def communicate(from_list, to_list, rank, sqrt_p, comm):
             comm.send(to_list[5], dest=rank-sqrt_p-1, tag = 17) 
 
     # return the received elements
-    return from_list
\ No newline at end of file
+    return from_list
+
+
+# communicate with the existing neighbours of the cartesian topology in one neighbourhood collective
+# the boundaries are handled by the topology: the directions without a neighbour keep their from_list element
+def communicate_neighbours(from_list, to_list, topology):
+    received = topology.graph.neighbor_alltoall([to_list[i] for i in topology.directions])
+    for i, message in zip(topology.directions, received):
+        from_list[i] = message
+    return from_list
+
+
+# fields of the placements of a new wave: faction code, x, y
+PLACEMENT_FIELDS = 3
+# fields of the units moved between the workers: faction code, x, y, hp, attack
+UNIT_FIELDS = 5
+
+
+# scatter the int32 placements of a new wave from the manager to the workers owning their cells
+# placements are sorted by the owning rank and counts has the number of placements of every rank
+def scatter_placements(comm, placements, counts):
+    sizes = np.asarray(counts, dtype=np.int32) * PLACEMENT_FIELDS
+    displacements = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+    comm.Scatter([sizes, MPI.INT], [np.empty(1, dtype=np.int32), MPI.INT], root=0)
+    placements = np.ascontiguousarray(placements, dtype=np.int32)
+    comm.Scatterv([placements, sizes, displacements, MPI.INT], [np.empty(0, dtype=np.int32), MPI.INT], root=0)
+
+
+# receive the (faction code, x, y) placements of a new wave on a worker
+def receive_placements(comm):
+    size = np.empty(1, dtype=np.int32)
+    comm.Scatter(None, [size, MPI.INT], root=0)
+    placements = np.empty(size[0], dtype=np.int32)
+    comm.Scatterv(None, [placements, MPI.INT], root=0)
+    return placements.reshape(-1, PLACEMENT_FIELDS)
+
+
+# send the (faction code, x, y, hp, attack) rows of the units of this worker to their owners in the
+# partition and return the rows of the units this worker owns now, workers is the worker communicator
+def migrate_units(workers, units, partition):
+    owners = partition.owners(units[:, 1], units[:, 2]) - 1
+    order = np.argsort(owners, kind="stable")
+    units = np.ascontiguousarray(units[order], dtype=np.int32)
+    send_sizes = np.bincount(owners, minlength=workers.Get_size()).astype(np.int32) * UNIT_FIELDS
+    receive_sizes = np.empty_like(send_sizes)
+    workers.Alltoall([send_sizes, MPI.INT], [receive_sizes, MPI.INT])
+
+    received = np.empty(receive_sizes.sum(), dtype=np.int32)
+    send_displacements = np.concatenate([[0], np.cumsum(send_sizes)[:-1]]).astype(np.int32)
+    receive_displacements = np.concatenate([[0], np.cumsum(receive_sizes)[:-1]]).astype(np.int32)
+    workers.Alltoallv([units, send_sizes, send_displacements, MPI.INT],
+                      [received, receive_sizes, receive_displacements, MPI.INT])
+    return received.reshape(-1, UNIT_FIELDS)
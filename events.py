@@ -0,0 +1,176 @@
+import glob
+import queue
+import sys
+import threading
+import numpy as np
+
+# structured event log of the simulation
+# every process records the events of its units as fixed size binary records into a ring of preallocated buffers,
+# a background thread writes the full buffers to the event file of the process (<output>_events.<rank>.bin)
+# and the merge tool turns the event files of all processes into the text of the debug output
+#
+# the log is off while LOG is None, the engines check it before they build any record:
+#     if events.LOG is not None:
+#         events.LOG.record(events.DEATH, faction, x, y)
+
+# event kinds, in the order of the phases of a round
+MOVE = 0
+UPGRADE = 1
+ATTACK = 2
+NO_ATTACK = 3
+DAMAGE = 4
+DEATH = 5
+HEAL = 6
+RAGE = 7
+SPAWN = 8
+
+# faction names by faction code (see array_simulation.FACTION_NAMES)
+FACTIONS = ["", "Earth", "Fire", "Water", "Air"]
+
+# one record is 32 bytes: the target is the destination of a move or the enemy of an attack (-1 when unknown),
+# value is the damage taken or the new attack power, hp is the hp after the event
+EVENT = np.dtype([("kind", np.int8), ("faction", np.int8), ("round", np.int16), ("wave", np.int32),
+                  ("x", np.int32), ("y", np.int32), ("target_x", np.int32), ("target_y", np.int32),
+                  ("value", np.int32), ("hp", np.int32)])
+
+# records per buffer and buffers in the ring
+CAPACITY = 1 << 14
+BUFFERS = 4
+
+# the event log of this process, None while logging is off
+LOG = None
+
+
+class EventLog:
+
+    def __init__(self, path, capacity=CAPACITY, buffers=BUFFERS):
+        self.file = open(path, "wb")
+        # wave and round stamped on the records
+        self.wave = 0
+        self.round = 0
+
+        # the ring: free buffers wait in free, full buffers wait in full until the thread wrote them
+        self.free = queue.Queue()
+        for i in range(buffers - 1):
+            self.free.put(np.empty(capacity, dtype=EVENT))
+        self.full = queue.Queue()
+        self.buffer = np.empty(capacity, dtype=EVENT)
+        self.size = 0
+
+        self.thread = threading.Thread(target=self._flush, daemon=True)
+        self.thread.start()
+
+    # set the wave and round of the next records
+    def at(self, wave, round):
+        self.wave, self.round = wave, round
+
+    # record one event
+    def record(self, kind, faction, x, y, target_x=-1, target_y=-1, value=0, hp=0):
+        if self.size == len(self.buffer):
+            self._swap()
+        self.buffer[self.size] = (kind, faction, self.round, self.wave, x, y, target_x, target_y, value, hp)
+        self.size += 1
+
+    # record one event per element of the coordinate arrays, the other fields are arrays or scalars
+    def record_many(self, kind, faction, x, y, target_x=-1, target_y=-1, value=0, hp=0):
+        count = len(x)
+        fields = {"kind": kind, "faction": faction, "round": self.round, "wave": self.wave, "x": x, "y": y,
+                  "target_x": target_x, "target_y": target_y, "value": value, "hp": hp}
+        done = 0
+        while done < count:
+            if self.size == len(self.buffer):
+                self._swap()
+            step = min(count - done, len(self.buffer) - self.size)
+            chunk = self.buffer[self.size:self.size + step]
+            for name, field in fields.items():
+                chunk[name] = field[done:done + step] if np.ndim(field) else field
+            self.size += step
+            done += step
+
+    # hand the current buffer to the thread and continue in a free one
+    def _swap(self):
+        self.full.put((self.buffer, self.size))
+        self.buffer = self.free.get()
+        self.size = 0
+
+    # write the full buffers until the log is closed
+    def _flush(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                return
+            buffer, size = item
+            buffer[:size].tofile(self.file)
+            self.free.put(buffer)
+
+    # write the remaining records and close the event file
+    def close(self):
+        self.full.put((self.buffer, self.size))
+        self.full.put(None)
+        self.thread.join()
+        self.file.close()
+
+
+# start the event log of this process
+def start(path):
+    global LOG
+    LOG = EventLog(path)
+
+
+# stop the event log of this process
+def stop():
+    global LOG
+    if LOG is not None:
+        LOG.close()
+        LOG = None
+
+
+# the event file of a process for the output file of the run
+def event_file(output_file, rank):
+    return f"{output_file[:-4]}_events.{rank}.bin"
+
+
+# text of an event like the debug output of the engines
+def describe(event):
+    kind, faction = int(event["kind"]), FACTIONS[event["faction"]]
+    at = f"{faction} unit at ({event['x']}, {event['y']})"
+    if kind == MOVE:
+        return f"🛫 {at} moved to x,y : {event['target_x']} {event['target_y']}"
+    if kind == UPGRADE:
+        return f"💪 {at} upgraded."
+    if kind == ATTACK:
+        target = f" ➡️ enemy: ({event['target_x']}, {event['target_y']})" if event["target_x"] >= 0 else ""
+        return f"🎯 {at} ⚔️ decided to attack{target}"
+    if kind == NO_ATTACK:
+        return f"🚫 {at} didn't attack."
+    if kind == DAMAGE:
+        return f"🗡️ {at} took 🩹 {event['value']} damage. 💜 HP: {event['hp']}"
+    if kind == DEATH:
+        return f"💀 {at} has died"
+    if kind == HEAL:
+        return f"😇 {at} healing .... HP: {event['hp']}"
+    if kind == RAGE:
+        return f"🔥 {at} increased attack power to {event['value']}"
+    return f"💧 {at} has spawned"
+
+
+# merge the event files of all processes of a run into the text of the debug output
+# the events are ordered by wave, round and phase, the flood of a wave is its last round
+def merge(output_file, text_file):
+    files = sorted(glob.glob(f"{output_file[:-4]}_events.*.bin"))
+    records = np.concatenate([np.fromfile(path, dtype=EVENT) for path in files]) if files else np.empty(0, dtype=EVENT)
+    records = records[np.lexsort((records["kind"], records["round"], records["wave"]))]
+
+    with open(text_file, "w") as f:
+        current = None
+        for event in records:
+            if (event["wave"], event["round"]) != current:
+                current = (event["wave"], event["round"])
+                f.write(f"🌟 Wave {current[0] + 1} Round {current[1] + 1}:\n")
+            f.write(describe(event) + "\n")
+
+
+# merge the event files of a run from the command line: python events.py <output_file> [text_file]
+if __name__ == "__main__":
+    output = sys.argv[1]
+    merge(output, sys.argv[2] if len(sys.argv) > 2 else f"{output[:-4]}_events.txt")
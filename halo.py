@@ -0,0 +1,131 @@
+import time
+import numpy as np
+from mpi4py import MPI
+import timing
+from array_simulation import OUTSIDE
+from topology import DIRECTIONS, OPPOSITE
+
+# typed-buffer halo exchange of the array engine
+# the boundary strips of the local columns are packed into preallocated contiguous buffers,
+# moved with buffer-based MPI calls and unpacked into the ghost cells of a preallocated haloed frame
+
+# the direction index of a point-to-point halo message is added to this tag
+HALO_TAG = 20
+
+
+# frame slice of the local cells next to the neighbour at the given step along one axis
+def _inner(size, depth, step):
+    if step > 0:
+        return slice(size, size + depth)
+    if step < 0:
+        return slice(depth, 2 * depth)
+    return slice(depth, depth + size)
+
+
+# frame slice of the ghost cells owned by the neighbour at the given step along one axis
+def _ghost(size, depth, step):
+    if step > 0:
+        return slice(depth + size, 2 * depth + size)
+    if step < 0:
+        return slice(0, depth)
+    return slice(depth, depth + size)
+
+
+# halo exchange of one worker over its topology (see topology.Topology)
+# mode "neighbor" moves the strips of the 8 directions in one Neighbor_alltoallv,
+# mode "ineighbor" uses the nonblocking Ineighbor_alltoallv,
+# mode "nonblocking" posts Irecv/Isend for the 8 directions at once,
+# mode "sendrecv" moves the strips direction by direction with Sendrecv
+class Halo:
+
+    def __init__(self, topology, shape, mode="neighbor"):
+        self.topology = topology
+        # (rows, columns) of the local cells
+        self.shape = shape
+        self.mode = mode
+        # preallocated frames and strip buffers keyed by (kind, depth, fields, dtype)
+        self._buffers = {}
+
+    # get the preallocated frame, the strip buffers of every direction and the flat buffers holding them
+    def _allocate(self, kind, depth, fields, dtype):
+        key = (kind, depth, fields, np.dtype(dtype))
+        if key not in self._buffers:
+            rows, columns = self.shape
+            frame = np.zeros((fields, rows + 2 * depth, columns + 2 * depth), dtype=dtype)
+            # ghost cells without a neighbour stay outside of the battlefield
+            if kind == "exchange":
+                frame[0] = OUTSIDE
+
+            shapes = [frame[:, _inner(rows, depth, dy), _inner(columns, depth, dx)].shape for dx, dy in DIRECTIONS]
+            sizes = [int(np.prod(shape)) for shape in shapes]
+            displacements = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+            send = np.empty(sum(sizes), dtype=dtype)
+            receive = np.empty(sum(sizes), dtype=dtype)
+            strips = [(send[start:start + size].reshape(shape), receive[start:start + size].reshape(shape))
+                      for start, size, shape in zip(displacements, sizes, shapes)]
+
+            # counts and displacements of the neighbourhood collectives, in the graph neighbour order
+            directions = self.topology.directions
+            layout = ([sizes[i] for i in directions], [int(displacements[i]) for i in directions])
+            self._buffers[key] = (frame, strips, [send, layout], [receive, layout])
+        return self._buffers[key]
+
+    # move the packed strips, strips[i] is the (send, receive) buffer pair of direction i
+    def _move(self, strips, send, receive):
+        if timing.TIMER is not None:
+            started = time.perf_counter()
+        cart, neighbours = self.topology.cart, self.topology.neighbours
+        if self.mode == "neighbor":
+            self.topology.graph.Neighbor_alltoallv(send, receive)
+        elif self.mode == "ineighbor":
+            self.topology.graph.Ineighbor_alltoallv(send, receive).Wait()
+        elif self.mode == "sendrecv":
+            for i in range(8):
+                cart.Sendrecv(strips[i][0], dest=neighbours[i], sendtag=HALO_TAG + i,
+                              recvbuf=strips[OPPOSITE[i]][1], source=neighbours[OPPOSITE[i]], recvtag=HALO_TAG + i)
+        else:
+            requests = [cart.Irecv(strips[i][1], source=neighbours[i], tag=HALO_TAG + OPPOSITE[i]) for i in range(8)]
+            requests += [cart.Isend(strips[i][0], dest=neighbours[i], tag=HALO_TAG + i) for i in range(8)]
+            MPI.Request.Waitall(requests)
+        if timing.TIMER is not None:
+            timing.TIMER.add("communicate", time.perf_counter() - started)
+
+    # surround the local columns with depth cells of the neighbours' columns
+    # the first column is the faction, ghost cells outside of the battlefield get the OUTSIDE faction
+    # returns the haloed frame (fields, rows + 2 * depth, columns + 2 * depth), it is reused by the next exchange
+    def exchange(self, columns, depth, dtype=np.int32):
+        rows, width = self.shape
+        frame, strips, send, receive = self._allocate("exchange", depth, len(columns), dtype)
+        for field, column in zip(frame, columns):
+            field[depth:depth + rows, depth:depth + width] = column
+
+        for i in self.topology.directions:
+            dx, dy = DIRECTIONS[i]
+            np.copyto(strips[i][0], frame[:, _inner(rows, depth, dy), _inner(width, depth, dx)])
+        self._move(strips, send, receive)
+        for i in self.topology.directions:
+            dx, dy = DIRECTIONS[i]
+            frame[:, _ghost(rows, depth, dy), _ghost(width, depth, dx)] = strips[i][1]
+        return frame
+
+    # get a zeroed haloed frame to collect values for the neighbours' cells in its ghost cells
+    def zeros(self, depth, fields, dtype=np.int32):
+        frame = self._allocate("accumulate", depth, fields, dtype)[0]
+        frame.fill(0)
+        return frame
+
+    # reverse exchange: send the ghost cells of the frame to their owners and add the
+    # ghost cells the neighbours collected for this worker to the local cells
+    # returns the local cells of the frame
+    def accumulate(self, frame, depth):
+        rows, width = self.shape
+        strips, send, receive = self._allocate("accumulate", depth, frame.shape[0], frame.dtype)[1:]
+
+        for i in self.topology.directions:
+            dx, dy = DIRECTIONS[i]
+            np.copyto(strips[i][0], frame[:, _ghost(rows, depth, dy), _ghost(width, depth, dx)])
+        self._move(strips, send, receive)
+        for i in self.topology.directions:
+            dx, dy = DIRECTIONS[i]
+            frame[:, _inner(rows, depth, dy), _inner(width, depth, dx)] += strips[i][1]
+        return frame[:, depth:depth + rows, depth:depth + width]
@@ -1,41 +1,128 @@
-import random
-
-def generate_unique_coordinates(N, num_units, used_coords):
-    coords = set()
-    while len(coords) < num_units:
-        row = random.randint(0, N-1)
-        col = random.randint(0, N-1)
-        coord = (row, col)
-        if coord not in used_coords and coord not in coords:
-            coords.add(coord)
-    return coords
-
-def generate_input_file(N, W, T, R, filename):
+import argparse
+import os
+import sys
+import numpy as np
+
+# the binary scenario writer lives next to main.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from array_simulation import FACTION_CODES
+from scenario import write_scenario
+
+FACTIONS = ['E', 'F', 'W', 'A']
+
+# density profiles of the unit placements
+# uniform:   every cell is equally likely
+# hotspots:  gaussian clusters around a few random centers, a few tiles get most of the units
+# frontline: a horizontal band through the middle of the battlefield
+# sparse:    small squads scattered over a large empty battlefield, most tiles and blocks stay empty
+PROFILES = ["uniform", "hotspots", "frontline", "sparse"]
+
+# number of hotspots, their spread and the width of the frontline as shares of the grid size
+HOTSPOTS = 4
+HOTSPOT_SPREAD = 0.05
+FRONTLINE_WIDTH = 0.1
+
+# units per squad of the sparse profile and the half width in cells of the square a squad stands in
+SQUAD = 8
+SQUAD_RADIUS = 2
+# grid size of the sparse profile when none is given
+SPARSE_SIZE = 256
+
+
+# draw candidate cells of a profile as (row, col) arrays, the candidates may repeat
+def draw_cells(rng, N, count, profile, centers):
+    if profile == "hotspots":
+        center = centers[rng.integers(0, len(centers), count)]
+        cells = np.rint(center + rng.normal(0, HOTSPOT_SPREAD * N, (count, 2))).astype(np.int64)
+        return np.clip(cells[:, 0], 0, N - 1), np.clip(cells[:, 1], 0, N - 1)
+    if profile == "frontline":
+        width = max(FRONTLINE_WIDTH * N, 1)
+        rows = np.rint(N / 2 + rng.uniform(-width / 2, width / 2, count)).astype(np.int64)
+        return np.clip(rows, 0, N - 1), rng.integers(0, N, count)
+    if profile == "sparse":
+        center = np.rint(centers[rng.integers(0, len(centers), count)]).astype(np.int64)
+        cells = center + rng.integers(-SQUAD_RADIUS, SQUAD_RADIUS + 1, (count, 2))
+        return np.clip(cells[:, 0], 0, N - 1), np.clip(cells[:, 1], 0, N - 1)
+    return rng.integers(0, N, count), rng.integers(0, N, count)
+
+
+# draw count unique cells of the profile as flat row * N + col indices in random order
+# the cells of the profile are drawn in batches and the repeated ones are dropped, when the profile
+# has no free cells left the rest is drawn uniformly
+def unique_cells(rng, N, count, profile, centers):
+    if count > N * N:
+        raise ValueError(f"{count} units do not fit on a {N}x{N} grid.")
+    if profile == "uniform":
+        return rng.choice(N * N, size=count, replace=False)
+
+    cells = np.empty(0, dtype=np.int64)
+    for attempt in range(32):
+        rows, cols = draw_cells(rng, N, 2 * (count - len(cells)) + 16, profile if attempt < 16 else "uniform", centers)
+        cells = np.concatenate([cells, rows * N + cols])
+        _, first = np.unique(cells, return_index=True)
+        cells = cells[np.sort(first)]
+        if len(cells) >= count:
+            return cells[:count]
+    free = np.setdiff1d(np.arange(N * N), cells)
+    return np.concatenate([cells, rng.permutation(free)[:count - len(cells)]])
+
+
+# generate the units of a wave as (faction code, x, y) rows, T units per faction on unique cells
+# the centers are the hotspots, or the squads of the sparse profile
+def generate_wave(rng, N, T, profile="uniform"):
+    centers = rng.uniform(0, N, (max(4 * T // SQUAD, 1) if profile == "sparse" else HOTSPOTS, 2))
+    cells = unique_cells(rng, N, 4 * T, profile, centers)
+    factions = np.repeat([FACTION_CODES[faction] for faction in FACTIONS], T)
+    # "row col" in the text format places the unit on x = col, y = row
+    return np.stack([factions, cells % N, cells // N], axis=1).astype(np.int32)
+
+
+def generate_input_file(N, W, T, R, filename, profile="uniform", rng=None):
+    rng = np.random.default_rng() if rng is None else rng
     with open(filename, 'w') as f:
         # Write header
         f.write(f"{N} {W} {T} {R}\n")
-        
+
         # Generate waves
         for wave in range(1, W+1):
             f.write(f"Wave {wave}:\n")
-            used_coords = set()
-            
-            # Generate coordinates for each faction
-            for faction in ['E', 'F', 'W', 'A']:
-                coords = generate_unique_coordinates(N, T, used_coords)
-                used_coords.update(coords)
-                
-                # Format coordinates
-                coord_str = ', '.join(f"{row} {col}" for row, col in coords)
+            units = generate_wave(rng, N, T, profile)
+
+            # Format coordinates
+            for faction, block in zip(FACTIONS, np.split(units, 4)):
+                coord_str = ', '.join(map("{} {}".format, block[:, 2].tolist(), block[:, 1].tolist()))
                 f.write(f"{faction}: {coord_str}\n")
-            
+
+
+# write the same kind of random scenario as a binary scenario (see scenario.py)
+def generate_binary_file(N, W, T, R, filename, profile="uniform", rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    write_scenario(filename, N, R, (generate_wave(rng, N, T, profile) for wave in range(W)))
 
 
 if __name__ == "__main__":
-    # Example usage
-    N = 24  # Grid size
-    W = 2  # Number of waves
-    T = 16  # Units per faction per wave
-    R = 4  # Rounds per wave
-    for i in range(50):
-        generate_input_file(N, W, T, R, filename=f"randomInput{i}.txt")
\ No newline at end of file
+    # without arguments 50 text files of the example size are written as before
+    #     python generateRandomInput.py
+    #     python generateRandomInput.py --size 10000 --units 250000 --profile hotspots --count 1 --binary
+    arguments = argparse.ArgumentParser(description="Generate random input files.")
+    arguments.add_argument("--size", type=int, default=None, help=f"grid size, 24 or {SPARSE_SIZE} for the sparse profile")
+    arguments.add_argument("--waves", type=int, default=2, help="number of waves")
+    arguments.add_argument("--units", type=int, default=16, help="units per faction per wave")
+    arguments.add_argument("--rounds", type=int, default=4, help="rounds per wave")
+    arguments.add_argument("--profile", default="uniform", choices=PROFILES)
+    arguments.add_argument("--count", type=int, default=50, help="number of input files")
+    arguments.add_argument("--prefix", default="randomInput")
+    arguments.add_argument("--seed", type=int, default=None)
+    arguments.add_argument("--binary", action="store_true", help="write binary scenarios instead of text files")
+    options = arguments.parse_args()
+
+    rng = np.random.default_rng(options.seed)
+    if options.size is None:
+        options.size = SPARSE_SIZE if options.profile == "sparse" else 24
+    for i in range(options.count):
+        if options.binary:
+            generate_binary_file(options.size, options.waves, options.units, options.rounds,
+                                 f"{options.prefix}{i}.bin", options.profile, rng)
+        else:
+            generate_input_file(options.size, options.waves, options.units, options.rounds,
+                                f"{options.prefix}{i}.txt", options.profile, rng)
@@ -1,210 +1,584 @@
 import numpy as np
 from mpi4py import MPI
-from simulation import Grid, FireUnit, WaterUnit, EarthUnit, AirUnit
-from communication import communicate
-from utils import get_processor_id, neighbor_relation, simulate_movement, get_air_attack_pattern, split_to_all
-from parser import parse_input
+from simulation import Grid, WaterUnit
+from communication import communicate, scatter_placements, receive_placements, migrate_units
+from utils import get_processor_id, neighbor_relation, simulate_movement, get_air_attack_pattern, split_to_all, write_output, \
+    find_spawns, resolve_rage
+from targets import LOCAL, OUTSIDE, target_table
+from scenario import Scenario, open_input, is_scenario, check_input
+from array_simulation import ArrayGrid, UNIT_CLASSES
+from array_engine import play_round, flood
+from halo import Halo
+from topology import Topology, split_workers
+from serial_engine import simulate
+from partition import Partition
+from output import gather_output, write_output_mpiio, count_factions
+from checkpoint import write_checkpoint, read_checkpoint
+import events
+import timing
+from replay import ReplayWriter, replay_file
 import sys
 import os
+import json
+import glob
 
 
 # Initialize the communicator
-comm = MPI.COMM_WORLD
+# in ensemble mode every group of ENSEMBLE_GROUP ranks plays its own runs on its own communicator (see ensemble)
+ENSEMBLE_GROUP = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[1] == "--ensemble" else None
+comm = MPI.COMM_WORLD if ENSEMBLE_GROUP is None else MPI.COMM_WORLD.Split(MPI.COMM_WORLD.Get_rank() // ENSEMBLE_GROUP)
 world_size = comm.Get_size()
 rank = comm.Get_rank()
 
+# the worker processes get their own communicator for the cartesian topology of the subgrids
+workers = split_workers(comm)
+
 DEBUG = False
 
-#if debug mode is off, redirect the output to /dev/null and write the debug information to an output file sys.argv[2]_detailed
-if not DEBUG:
+# grid engine of the worker processes
+# "object" keeps the subgrid as an object array of Unit instances
+# "array" keeps the subgrid as typed per-cell columns (see array_simulation.ArrayGrid)
+ENGINE = "object"
+
+# communication between the worker processes
+# "cart" exchanges all 8 directions in one neighbourhood collective of the cartesian worker topology
+# "pairwise" uses the odd/even send/recv protocol of communication.communicate (object engine only)
+COMMUNICATION = "cart"
+
+# worker layout as (rows, columns), None picks the most square layout of the worker processes (MPI.Compute_dims)
+# the grid size does not need to be divisible by the layout, the first tiles of a row or column get the remainder
+LAYOUT = None
+
+# density-aware repartitioning: between waves the tile boundaries move along the unit density when the
+# slowest worker took more than BALANCE_THRESHOLD times the mean wave time of the workers
+BALANCE = False
+BALANCE_THRESHOLD = 1.25
+
+# how the units get from one wave to the next
+# "resident" keeps the units on the workers between the waves, the manager only scatters the new units of a wave
+# "redistribute" collects the subgrids at the end of every wave and sends the subgrids of the next wave from the main grid
+WAVE_TRANSITION = "resident"
+
+# assembly of the output file
+# "gatherv" gathers the tiles of the workers encoded as bytes of the output file into one buffer of the manager
+# "mpiio" lets every worker write its encoded tile at its offsets of the output file with collective MPI-IO
+# "pickle" collects the subgrids of the workers into the main grid of the manager and writes its rows
+OUTPUT = "gatherv"
+
+# checkpoints (see checkpoint.py): the workers write the battlefield to CHECKPOINT after every wave,
+# and every CHECKPOINT_ROUNDS rounds inside a wave when it is not 0, None writes no checkpoints
+# a run resumes from a checkpoint given as the third argument: python main.py <input> <output> <checkpoint>
+CHECKPOINT = None
+CHECKPOINT_ROUNDS = 0
+
+# grids up to this size are played by the serial engine in the manager process (see serial_engine.py),
+# the engine is also used for single process runs (mpiexec -n 1)
+SERIAL_GRID_SIZE = 32
+
+# halo exchange of the array engine, "neighbor" (Neighbor_alltoallv), "ineighbor" (Ineighbor_alltoallv),
+# "nonblocking" (Isend/Irecv) or "sendrecv"
+HALO_MODE = "neighbor"
+
+# structured event log (see events.py): every process writes the events of its units to <output>_events.<rank>.bin,
+# python events.py <output> merges them into the text of the debug output
+EVENTS = False
+
+# replay stream (see replay.py): every worker appends the cells of its tile that changed in a round to
+# <output>_replay.<rank>.bin, python replay.py <output> <wave> <round> prints any round without a master that collects them
+REPLAY = False
+
+# phase timers of the worker loop (see timing.py): the min, mean and max seconds of the workers in every phase
+# of a wave are reduced to the manager and written to <output>_timing.json at the end of the run,
+# functions added with timing.add_hook are called at every phase boundary
+TIMING = False
+
+#if debug mode is off, the manager writes its progress to the output file <output>_detailed of every run (see run)
+#and the output of the workers goes to /dev/null
+if not DEBUG and rank != 0:
     sys.stdout = open(os.devnull, 'w')
-    sys.stdout = open(sys.argv[2][:-4] + "_detailed.txt", "w")
-    
-    
 
-#if the rank is 0, then it is the manager process
-if rank == 0:
 
-    #parse the input file
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    grid_size, rounds, waves = parse_input(input_file)    
+# record an event of a unit of the object engine
+def record(kind, unit, target=(-1, -1)):
+    events.LOG.record(kind, events.FACTIONS.index(unit.faction), unit.x, unit.y, target[0], target[1], hp=unit.hp)
 
-    #send the wave information to the worker processes
-    for proc in range(1, world_size):
-        comm.send({"rounds": rounds, "waves": len(waves)}, dest=proc, tag=101)
-    comm.Barrier()
 
+# partition the battlefield into one tile per worker process (see partition.Partition)
+def partition_battlefield(grid_size):
+    rows, columns = LAYOUT if LAYOUT is not None else MPI.Compute_dims(world_size - 1, 2)
 
+    # Check if the layout has one tile per worker process and every tile has at least one cell
+    if rows * columns != world_size - 1:
+        raise ValueError("The worker layout must have one tile per worker process.")
+    if grid_size < rows or grid_size < columns:
+        raise ValueError("Grid size must be at least the number of worker rows and columns.")
 
-    #create the main grid
-    main_grid = Grid(grid_size)
+    # Check if the odd/even protocol can pair the processors
+    if ENGINE == "object" and COMMUNICATION == "pairwise" and rows != columns:
+        raise ValueError("Pairwise communication needs a square worker layout.")
 
-    
-    #initialize the units in the main grid
-    for wave in waves:
+    partition = Partition.blocks(grid_size, grid_size, rows, columns)
 
-        for unit in wave:
-            if main_grid.get_unit(unit[1], unit[2]) is None:
-                if unit[0] == "E":
-                    EarthUnit(unit[1], unit[2], main_grid)
-                elif unit[0] == "W":
-                    WaterUnit(unit[1], unit[2], main_grid)
-                elif unit[0] == "F":
-                    FireUnit(unit[1], unit[2], main_grid)
-                elif unit[0] == "A":
-                    AirUnit(unit[1], unit[2], main_grid)
+    # Check if the subgrids are large enough for the halos, the air units reach 3 cells into the next tile
+    # with their movement and attacks, and both engines only exchange with the adjacent tiles
+    width, height = partition.smallest_tile()
+    if (columns > 1 and width < 3) or (rows > 1 and height < 3):
+        raise ValueError("Subgrid size must be at least 3 along the split axes.")
+    return partition
 
 
-        sqrt_p = int((world_size - 1)**0.5)
+# recompute the tiles from the unit density when the workers are out of balance
+# density has the unit counts of the columns followed by the unit counts of the rows of the battlefield,
+# loads are the wave times of the workers in the last wave, or their unit counts before the first wave
+def rebalance(partition, density, loads):
+    imbalance = max(loads) / max(np.mean(loads), 1e-9)
+    print(f"⚖️ Load per worker: {[round(float(load), 3) for load in loads]}, slowest / mean: {imbalance:.2f}")
+    if imbalance <= BALANCE_THRESHOLD:
+        return partition
 
-        # Check if the number of worker processes is a perfect square minus one
-        if sqrt_p * sqrt_p != (world_size - 1):
-            raise ValueError("Number of worker processes must be sqrt_p perfect square minus one.")
+    # an empty cell still costs a little, so that empty regions are split too
+    column_counts, row_counts = density[:partition.width], density[partition.width:]
+    column_weights = 0.9 * column_counts + 0.1 * partition.height
+    row_weights = 0.9 * row_counts + 0.1 * partition.width
 
+    # keep the tiles large enough for the halos, but never above the smallest tile of the block partition
+    minimum = min(3, *partition.smallest_tile())
+    balanced = Partition.balanced(column_weights, row_weights, partition.rows, partition.columns, minimum)
+    print(f"⚖️ Repartitioned the battlefield: x cuts {balanced.x_cuts}, y cuts {balanced.y_cuts}")
+    return balanced
 
-        # Check if the grid size is divisible by sqrt_p
-        if grid_size % sqrt_p != 0:
-            raise ValueError("Grid size must be divisible by sqrt(number of worker processes).")
 
+# the manager collects the subgrids of the workers at the end of every wave when it redistributes them
+# and in debug mode, otherwise the units stay on the workers and only the final grid is collected for the output
+def collects(wave, waves):
+    return WAVE_TRANSITION == "redistribute" or DEBUG or (wave == waves - 1 and OUTPUT == "pickle")
 
-        print("--------------------")   
-        print(f"🏄🏿 Wave {waves.index(wave) + 1} Initialization:")
-        main_grid.display()
-        print("--------------------")      
 
-        print("Units:")
+# assemble the output file from the tiles of the workers encoded as bytes, encoded is None on the manager
+# with MPI-IO the workers write the file alone
+def assemble_output(encoded, partition, output_file):
+    if OUTPUT == "mpiio":
+        if encoded is not None:
+            write_output_mpiio(workers, encoded, partition, output_file)
+    else:
+        gather_output(comm, encoded, partition, output_file)
 
 
-        #print all units in the main grid for debugging purposes
-        for unit in main_grid.get_all_units():
-            print(unit)
+# receive the subgrids of the workers with the given tag and combine them into a new main grid
+def collect(tag, partition, grid_size):
+    main_grid = Grid(grid_size)
+    for proc in range(1, world_size):
+        subgrid = comm.recv(source=proc, tag=tag)
+        start_x, start_y, width, height = partition.tile(proc)
+        for i in range(start_x, start_x + width):
+            for j in range(start_y, start_y + height):
+                unit = subgrid.get_unit(i, j)
+                if unit is not None:
+                    main_grid.place_unit(unit)
+    return main_grid
 
-        print("--------------------")      
 
-        subgrid_size = grid_size // sqrt_p  # Size of each subgrid
+# the (faction code, x, y) rows of a wave (see parser.stream_waves) without the units outside of the battlefield
+def wave_placements(wave, grid_size):
+    x, y = wave[:, 1], wave[:, 2]
+    return wave[(0 <= x) & (x < grid_size) & (0 <= y) & (y < grid_size)]
 
 
-        #send the subgrids to the worker processes
-        for proc in range(1, world_size):
-            # Calculate subgrid offsets
-            start_x = ((proc - 1) % sqrt_p) * subgrid_size
-            start_y = ((proc - 1) // sqrt_p) * subgrid_size
+# the manager process (rank 0) parses the input, distributes the units to the workers and collects them
+def manager(input_file, output_file, restart=None):
 
-            # Create sqrt_p subgrid instance with appropriate offset
-            subgrid = Grid(subgrid_size, offset_x=start_x, offset_y=start_y)
+    #parse the header of the input file, the waves are read one at a time while the simulation runs
+    grid_size, rounds, wave_count, waves = open_input(input_file)
+    # the workers read the units of their own tiles from a binary scenario (see scenario.py) when they are resident
+    scenario = Scenario(input_file) if is_scenario(input_file) else None
+    direct = scenario is not None and WAVE_TRANSITION == "resident"
 
-            # Populate the subgrid with units from the main grid
-            for i in range(start_x, start_x + subgrid_size):
-                for j in range(start_y, start_y + subgrid_size):
-                    unit = main_grid.get_unit(i, j)
-                    if unit is not None:
-                        subgrid.place_unit(unit)
+    # single process runs and small grids are played by the serial engine in this process
+    serial = world_size == 1 or grid_size <= SERIAL_GRID_SIZE
+    partition = None if serial else partition_battlefield(grid_size)
 
-            # Send the subgrid directly to the worker
-            comm.send(subgrid, dest=proc, tag=100)
-        comm.Barrier()
+    # a restart resumes at the wave and round of the checkpoint
+    resume_wave, resume_round = 0, 0
+    if restart is not None:
+        checkpoint_size, resume_wave, resume_round, units = read_checkpoint(restart)
+        if serial or checkpoint_size != grid_size:
+            raise ValueError("The checkpoint must be of the same grid size and restored by worker processes.")
 
+    #broadcast the wave information to the worker processes
+    comm.bcast({"rounds": rounds, "waves": wave_count, "grid_size": grid_size, "serial": serial,
+                "partition": partition, "scenario": input_file if direct else None,
+                "output": output_file, "restart": restart, "resume": (resume_wave, resume_round)}, root=0)
 
-        #receive the subgrids from the worker processes
-        for round in range(rounds):
-            main_grid = Grid(grid_size)
-            
-            #sync the processes
-            comm.Barrier()
-            comm.Barrier()
-            comm.Barrier()
-            comm.Barrier()
-            comm.Barrier()
-            comm.Barrier()
-            comm.Barrier()
-            
+    if serial:
+        write_output(simulate(grid_size, rounds, waves, DEBUG), output_file)
+        return
 
-            # if debug mode is on, then display the grid every round for debugging purposes
-            if DEBUG:
+
+
+    #create the main grid, with the units of the checkpoint on a restart
+    main_grid = Grid(grid_size)
+    if restart is not None:
+        restored = ArrayGrid(grid_size)
+        restored.place_rows(units)
+        main_grid = restored.to_grid()
+    # the manager keeps the main grid up to date between the waves when it redistributes the subgrids or debugs
+    tracked = WAVE_TRANSITION == "redistribute" or DEBUG
+    # wave times and unit density reported by the workers, used for the repartitioning
+    times = None
+    density = np.zeros(2 * grid_size, dtype=np.int64)
+    # phase times of the waves
+    report = []
+
+    
+    #initialize the units in the main grid
+    for index in range(wave_count):
+        # the text input is read in order, also the waves before the checkpoint
+        wave = next(waves) if scenario is None else None
+        if index < resume_wave:
+            continue
+
+        # the units of the wave the checkpoint was written in are already on the battlefield
+        resumed = index == resume_wave and resume_round > 0
+        # the manager only reads the waves of a binary scenario when it needs the units itself
+        if resumed:
+            placements = np.empty((0, 3), dtype=np.int32)
+        elif direct and not tracked and not BALANCE:
+            placements = None
+        else:
+            placements = wave_placements(scenario.wave(index) if scenario is not None else wave, grid_size)
+
+        if tracked:
+            for faction, x, y in placements.tolist():
+                if main_grid.get_unit(x, y) is None:
+                    UNIT_CLASSES[faction](x, y, main_grid)
+
+        # the grid and the units are only printed in debug mode, the progress lines are enough otherwise
+        if DEBUG:
+            print("--------------------")   
+            print(f"🏄🏿 Wave {index + 1} Initialization:")
+            main_grid.display()
+            print("--------------------")      
+
+            print("Units:")
+
+
+            #print all units in the main grid for debugging purposes
+            for unit in main_grid.get_all_units():
+                print(unit)
+
+            print("--------------------")      
+        else:
+            count = len(placements) if placements is not None else scenario.count(index)
+            print(f"🏄🏿 Wave {index + 1} Initialization: {count} new units")
+
+        # move the tile boundaries along the unit density when the workers are out of balance
+        if BALANCE:
+            x, y = placements[:, 1], placements[:, 2]
+            density += np.concatenate([np.bincount(x, minlength=grid_size), np.bincount(y, minlength=grid_size)])
+            loads = times if times is not None else np.bincount(partition.owners(x, y), minlength=world_size)[1:]
+            partition = comm.bcast(rebalance(partition, density, loads), root=0)
+
+        if WAVE_TRANSITION == "resident":
+            # only the new units travel, bucketed by the worker owning their cell, unless the workers read them
+            if not direct:
+                owners = partition.owners(placements[:, 1], placements[:, 2])
+                order = np.argsort(owners, kind="stable")
+                scatter_placements(comm, placements[order], np.bincount(owners, minlength=world_size))
+        else:
+            #send the subgrids to the worker processes
+            for proc in range(1, world_size):
+                # Calculate subgrid offsets and size
+                start_x, start_y, width, height = partition.tile(proc)
+
+                # Create the subgrid instance with appropriate offset
+                subgrid = Grid(width, offset_x=start_x, offset_y=start_y, height=height)
+
+                # Populate the subgrid with units from the main grid
+                for i in range(start_x, start_x + width):
+                    for j in range(start_y, start_y + height):
+                        unit = main_grid.get_unit(i, j)
+                        if unit is not None:
+                            subgrid.place_unit(unit)
+
+                # Send the subgrid directly to the worker
+                comm.send(subgrid, dest=proc, tag=100)
+
+
+        # the manager takes no part in the rounds, the workers only sync with their neighbours
+        # if debug mode is on, then receive the subgrids every round and display the grid for debugging purposes
+        if DEBUG:
+            for round in range(resume_round if resumed else 0, rounds):
                 # receive computed subgrids from workers and combine them and display the final grid
-                for proc in range(1, world_size):
-                    # print(f"Receiving subgrid from {proc}")
-                    subgrid = comm.recv(source=proc, tag=102)
-                    # print(f"Received subgrid from {proc}")
-                    start_x = ((proc - 1) % sqrt_p) * subgrid_size
-                    start_y = ((proc - 1) // sqrt_p) * subgrid_size
-                    for i in range(start_x, start_x + subgrid_size):
-                        for j in range(start_y, start_y + subgrid_size):
-                            unit = subgrid.get_unit(i, j)
-                            if unit is not None:
-                                main_grid.place_unit(unit)
-                
+                main_grid = collect(102, partition, grid_size)
+
                 #display the final grid for debugging purposes
-                comm.Barrier()
-                print("--------------------")   
+                print("--------------------")
                 print(f"🌟 Round {round + 1} End:")
                 main_grid.display()
-                print("--------------------")   
+                print("--------------------")
+
+        #receive the subgrids from the worker processes
+        if collects(index, wave_count):
+            main_grid = collect(103, partition, grid_size)
+
+        # receive the wave times and the unit counts of the columns and rows of the workers
+        if BALANCE:
+            times = comm.gather(None, root=0)[1:]
+            comm.Reduce(np.zeros(2 * grid_size, dtype=np.int64), density, op=MPI.SUM, root=0)
+
+        # the min, mean and max phase times of the workers
+        if TIMING:
+            report.append(reduce_timing(index))
 
-            
-        #send the subgrids to the worker processes
-        comm.Barrier()
-
-        main_grid = Grid(grid_size)
-        for proc in range(1, world_size):
-            # print(f"Receiving subgrid from {proc}")
-            subgrid = comm.recv(source=proc, tag=103)
-            # print(f"Received subgrid from {proc}")
-            start_x = ((proc - 1) % sqrt_p) * subgrid_size
-            start_y = ((proc - 1) // sqrt_p) * subgrid_size
-            for i in range(start_x, start_x + subgrid_size):
-                for j in range(start_y, start_y + subgrid_size):
-                    unit = subgrid.get_unit(i, j)
-                    if unit is not None:
-                        main_grid.place_unit(unit)
-                     
         #display the final grid for debugging purposes   
-        print("--------------------")   
-        print(f"🌊 Wave {waves.index(wave) + 1} End:")
-        main_grid.display()
-        for unit in main_grid.get_all_units():
-            print(unit)
-        print("--------------------")
-        comm.Barrier()
+        if DEBUG:
+            print("--------------------")   
+            print(f"🌊 Wave {index + 1} End:")
+            main_grid.display()
+            for unit in main_grid.get_all_units():
+                print(unit)
+            print("--------------------")
+        else:
+            print(f"🌊 Wave {index + 1} End")
+
+    if TIMING:
+        with open(output_file[:-4] + "_timing.json", "w") as f:
+            json.dump({"workers": world_size - 1, "rounds": rounds, "waves": report}, f, indent=1)
 
     #print all units to the output file
-    with open(output_file, "w") as f:
-    
-        print("Final Output:")
-        display_rows = main_grid.display()
-        for row in display_rows:
-            f.write("".join(row))
-            
-            f.write("\n")
-    
+    if OUTPUT == "pickle":
+        write_output(main_grid, output_file)
+        return
 
-# if the rank is not 0, then it is a worker process    
-else:
-    #send the wave information to the worker processes
-    wave_info = comm.recv(source=0, tag=101)
-    comm.Barrier()
+    # the workers send or write the rows of their tiles, the grid is only printed in debug mode
+    print("Final Output:")
+    if DEBUG:
+        main_grid.display()
+    assemble_output(None, partition, output_file)
+
+
+# empty grid of the engine for the tile of this worker
+def empty_tile(partition):
+    x, y, width, height = partition.tile(rank)
+    if ENGINE == "array":
+        return ArrayGrid(width, x, y, height)
+    return Grid(width, x, y, height=height)
+
+
+# place the (faction code, x, y) placements of a new wave on the empty cells of the tile, the first unit placed on a cell wins
+def place_wave(tile, placements):
+    if ENGINE == "array":
+        tile.place_wave(placements)
+        return
+    for faction, x, y in placements.tolist():
+        if tile.get_unit(x, y) is None:
+            UNIT_CLASSES[faction](x, y, tile)
+
+
+# get the units of the tile as (faction code, x, y, hp, attack) rows (see ArrayGrid.unit_rows)
+def unit_rows(tile):
+    return (tile if ENGINE == "array" else ArrayGrid.from_grid(tile)).unit_rows()
+
+
+# build the tile of this worker from the (faction code, x, y, hp, attack) rows of its units
+def build_tile(units, partition):
+    x, y, width, height = partition.tile(rank)
+    tile = ArrayGrid(width, x, y, height)
+    tile.place_rows(units)
+    return tile if ENGINE == "array" else tile.to_grid()
+
+
+# move the units of the tile to the workers owning them in the new partition and build the new tile
+def move_tile(tile, partition):
+    return build_tile(migrate_units(workers, unit_rows(tile), partition), partition)
+
+
+# build the tile of this worker from the units of a checkpoint, the checkpoint may come from another layout
+def restore_tile(units, partition):
+    return build_tile(units[partition.owners(units[:, 1], units[:, 2]) == rank], partition)
+
+
+# write a checkpoint inside a wave after every CHECKPOINT_ROUNDS rounds, round is the index of the round just played
+def checkpoint_round(tile, wave, round, rounds, grid_size):
+    if CHECKPOINT is not None and CHECKPOINT_ROUNDS and (round + 1) % CHECKPOINT_ROUNDS == 0 and round + 1 < rounds:
+        write_checkpoint(workers, unit_rows(tile), grid_size, wave, round + 1, CHECKPOINT)
+
+
+# reduce the phase times of the workers in a wave to their min, mean and max on the manager
+def reduce_timing(wave):
+    phases = len(timing.PHASES)
+    minimum, total, maximum = np.empty(phases), np.empty(phases), np.empty(phases)
+    comm.Reduce(np.full(phases, np.inf), minimum, op=MPI.MIN, root=0)
+    comm.Reduce(np.zeros(phases), total, op=MPI.SUM, root=0)
+    comm.Reduce(np.full(phases, -np.inf), maximum, op=MPI.MAX, root=0)
+    summary = timing.summary(minimum, total, maximum, world_size - 1)
+    # the exchanges are part of the phases, so they are left out of the slowest phase
+    slowest = max((phase for phase in summary if phase != "communicate"), key=lambda phase: summary[phase]["max"], default=None)
+    if slowest is not None:
+        print(f"⏱️ Wave {wave + 1} slowest phase: {slowest}, max {summary[slowest]['max']:.4f}s, mean {summary[slowest]['mean']:.4f}s")
+    return {"wave": wave + 1, "phases": summary}
+
+
+# send the phase times of this worker in the wave to the manager
+def send_timing():
+    totals = timing.TIMER.collect()
+    for op in (MPI.MIN, MPI.SUM, MPI.MAX):
+        comm.Reduce(totals, None, op=op, root=0)
+
+
+# append the frame of the tile at the end of a round to the replay stream of the worker
+def replay_frame(replay, tile, wave, round):
+    if replay is not None:
+        frame = tile if ENGINE == "array" else ArrayGrid.from_grid(tile)
+        replay.frame(wave, round, frame.offset_x, frame.offset_y, frame.faction, frame.hp)
+
+
+# end the wave on a worker: send the subgrid to the manager when it collects the wave,
+# report the wave time and the unit counts of the columns and rows of the battlefield when balancing
+# and write the checkpoint of the wave
+def finish_wave(tile, elapsed, wave, waves, grid_size):
+    if collects(wave, waves):
+        comm.send(tile.to_grid() if ENGINE == "array" else tile, dest=0, tag=103)
+    if BALANCE:
+        units = unit_rows(tile)
+        density = np.concatenate([np.bincount(units[:, 1], minlength=grid_size),
+                                  np.bincount(units[:, 2], minlength=grid_size)]).astype(np.int64)
+        comm.gather(elapsed, root=0)
+        comm.Reduce(density, None, op=MPI.SUM, root=0)
+    if TIMING:
+        send_timing()
+    # the next run can resume at the start of the next wave
+    if CHECKPOINT is not None:
+        write_checkpoint(workers, unit_rows(tile), grid_size, wave + 1, 0, CHECKPOINT)
+
+
+# the worker processes play the rounds on their subgrids
+# returns False when the manager ends a batch instead of starting a run
+def worker():
+    #receive the wave information from the manager
+    wave_info = comm.bcast(None, root=0)
+    if wave_info is None:
+        return False
+
+    # the manager plays the serial runs alone
+    if wave_info["serial"]:
+        return True
+
+    if EVENTS:
+        events.start(events.event_file(wave_info["output"], rank))
 
     waves = wave_info["waves"]
     rounds = wave_info["rounds"]
-    for wave in range(waves):
-        
-        # Receive the subgrid
+    grid_size = wave_info["grid_size"]
+
+    # build the cartesian topology of the workers
+    partition = wave_info["partition"]
+    cart = Topology(workers, partition.dims)
+    topology = cart if COMMUNICATION == "cart" else None
+
+    # the typed halo buffers of the array engine are allocated once for every tile shape
+    if ENGINE == "array":
+        width, height = partition.tile(rank)[2:]
+        halo = Halo(cart, (height, width), HALO_MODE)
+
+    # the units of every wave are read from the binary scenario or scattered by the manager
+    scenario = Scenario(wave_info["scenario"]) if wave_info["scenario"] is not None else None
+
+    # a restart starts with the units of the checkpoint at its wave and round
+    resume_wave, resume_round = wave_info["resume"]
+    units = read_checkpoint(wave_info["restart"])[3] if wave_info["restart"] is not None else None
+
+    # the phase timers of this worker
+    if TIMING:
+        timing.start()
+    timer = timing.TIMER
+
+    # the replay stream of this worker starts with a keyframe of the first round played
+    replay = ReplayWriter(replay_file(wave_info["output"], rank), grid_size, rounds) if REPLAY else None
+
+    # the subgrid of this worker, it stays on the worker between the waves when the units are resident
+    tile = None
+    for wave in range(resume_wave, waves):
+        resumed = wave == resume_wave and resume_round > 0
+        first_round = resume_round if resumed else 0
+
+        # the tile of this worker moves when the manager repartitions the battlefield
+        repartitioned = False
+        if BALANCE:
+            previous, partition = partition, comm.bcast(None, root=0)
+            repartitioned = partition != previous
+            if ENGINE == "array" and partition.tile(rank)[2:] != (width, height):
+                width, height = partition.tile(rank)[2:]
+                halo = Halo(cart, (height, width), HALO_MODE)
+
+        if WAVE_TRANSITION == "resident":
+            # the units of the last wave stay on the worker, only the new units of the wave arrive
+            if tile is None:
+                tile = empty_tile(partition) if units is None else restore_tile(units, partition)
+            elif repartitioned:
+                tile = move_tile(tile, partition)
+            if scenario is None:
+                placements = receive_placements(comm)
+            elif not resumed:
+                placements = scenario.tile(wave, *partition.tile(rank))
+            else:
+                placements = np.empty((0, 3), dtype=np.int32)
+            place_wave(tile, placements)
+        else:
+            # Receive the subgrid
+            subgrid = comm.recv(source=0, tag=100)
+            tile = ArrayGrid.from_grid(subgrid) if ENGINE == "array" else subgrid
+        started = MPI.Wtime()
+
+        # the array engine plays the whole wave on the typed columns and converts back for the manager
+        if ENGINE == "array":
+            array_grid = tile
+            for round in range(first_round, rounds):
+                if events.LOG is not None:
+                    events.LOG.at(wave, round)
+                if timer is not None:
+                    timer.at(wave, round)
+                play_round(array_grid, halo, DEBUG)
+
+                # if debug mode is on, then send the subgrid back to the manager at the end of the round
+                if DEBUG:
+                    comm.send(array_grid.to_grid(), dest=0, tag=102)
+                checkpoint_round(array_grid, wave, round, rounds, grid_size)
+                replay_frame(replay, array_grid, wave, round)
+
+            # water units flood and fire units calm down at the end of the wave
+            if events.LOG is not None:
+                events.LOG.at(wave, rounds)
+            if timer is not None:
+                timer.at(wave, rounds)
+            flood(array_grid, halo, DEBUG)
+            array_grid.reset_attack_power()
+            elapsed = MPI.Wtime() - started
+            replay_frame(replay, array_grid, wave, rounds)
 
-        subgrid = comm.recv(source=0, tag=100)
-        comm.Barrier()
-        sqrt_p = int((world_size - 1)**0.5)
+            finish_wave(array_grid, elapsed, wave, waves, grid_size)
+            continue
 
+        subgrid = tile
 
-        for round in range(rounds):
+        for round in range(first_round, rounds):
 
             # print(f"🌟 Round {round + 1}: , rank: {rank}")
+            if events.LOG is not None:
+                events.LOG.at(wave, round)
+            if timer is not None:
+                timer.at(wave, round)
+
+            # keep the units in a map while the subgrid is sparse and in the object array while it is dense
+            subgrid.update_storage()
 
 
             # Create a list of subgrids to store the neighbours for the movement phase
-            neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100)] *8
+            neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100, sparse=True)] *8
 
-            neighbour_subgrids = communicate(neighbour_subgrids,split_to_all(subgrid,[3]* 8) ,rank,sqrt_p,comm)
+            neighbour_subgrids = communicate(neighbour_subgrids,split_to_all(subgrid,[3]* 8) , rank, partition.columns, comm, topology)
+            if timer is not None:
+                timer.lap("movement halo")
 
            #create a list to store the selected movements
 
@@ -215,14 +589,16 @@ else:
                 
                 #if the unit is an air unit, simulate the movement to fşnd the new x and y coordinates
                 if unit.faction == "Air":
-                    x,y,unit.attack_messages = simulate_movement(unit, subgrid, neighbour_subgrids, rank, world_size , sqrt_p)
+                    x,y,unit.attack_messages = simulate_movement(unit, subgrid, neighbour_subgrids, rank, partition)
                     # which processor the unit should move to
-                    movement_processor = get_processor_id(x, y, sqrt_p, subgrid.get_size())
+                    movement_processor = get_processor_id(x, y, partition)
                 
                     # if the unit should stay in the same processor
                     if movement_processor == rank:
                         if DEBUG:
                             print("🛫 unit:", unit, "moved to x,y :", x,y)
+                        if events.LOG is not None:
+                            record(events.MOVE, unit, (x, y))
 
                         # enqueue the movement and removal of the unit
                         subgrid.enqueue_removal(unit, unit.x, unit.y)
@@ -232,44 +608,48 @@ else:
                     else:
                         if DEBUG:
                             print("🛫 unit:", unit, "moved to x,y :", x,y)
+                        if events.LOG is not None:
+                            record(events.MOVE, unit, (x, y))
 
                         # find the relation index of the neighbour processor
-                        relation_index = neighbor_relation(rank, movement_processor, sqrt_p)
+                        relation_index = neighbor_relation(rank, movement_processor, partition)
                         # add the movement to the selected movements list
                         selected_movements[relation_index].append({"x": x, "y": y, "unit": unit})
                         # enqueue the removal of the unit
                         subgrid.enqueue_removal(unit, unit.x, unit.y)
 
 
+            if timer is not None:
+                timer.lap("movement")
+
             # communicate the selected movements to the neighbour processors to inform them about the movements
             subgrid_movement_queues = [[] for i in range(8)]
-            subgrid_movement_queues = communicate(subgrid_movement_queues, selected_movements, rank, sqrt_p, comm)
-
-            # sync the processes
-            comm.Barrier()
+            subgrid_movement_queues = communicate(subgrid_movement_queues, selected_movements, rank, partition.columns, comm, topology)
 
             # iterate over the subgrid movement queues and enqueue the movements
             for i in range(8):
                 for message in subgrid_movement_queues[i]:
                     subgrid.enqueue_movement_from_message(message)
+            if timer is not None:
+                timer.lap("movement exchange")
 
             # resolve the removal and movement of the units
             subgrid.resolve_removal()
             subgrid.resolve_movement(DEBUG)
-
-            # sync the processes
-            comm.Barrier() 
+            if timer is not None:
+                timer.lap("movement resolution")
 
             # Create a list of subgrids to store the neighbours for the attack phase
-            neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100)] *8
+            neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100, sparse=True)] *8
 
-            neighbour_subgrids = communicate(neighbour_subgrids, split_to_all(subgrid,[2]* 8),rank,sqrt_p,comm)
-
-            # sync the processes
-            comm.Barrier()
+            neighbour_subgrids = communicate(neighbour_subgrids, split_to_all(subgrid,[2]* 8), rank, partition.columns, comm, topology)
+            if timer is not None:
+                timer.lap("attack halo")
 
             #create a list to store the selected attacks
             selected_attacks = [[] for i in range(8)]
+            # the units on the targets are found in the grid of the owner code of the target tables (see targets.py)
+            grids = neighbour_subgrids + [subgrid]
 
             # iterate over all units in the subgrid
             for unit in subgrid.get_all_units():
@@ -280,184 +660,304 @@ else:
                     # if the unit is an air unit, get the attack pattern and attack the enemies
                     if unit.faction == "Air":
 
-                        air_attack_pattern = unit.get_attack_pattern(unit.x, unit.y)
-                        unit.attack_messages = get_air_attack_pattern(unit, air_attack_pattern, subgrid, neighbour_subgrids, rank, world_size , sqrt_p)
+                        unit.attack_messages = get_air_attack_pattern(unit, unit.x, unit.y, subgrid, neighbour_subgrids, rank, partition)
 
                         # iterate over the attack messages and enqueue the attacks
-                        for message in unit.attack_messages:
-                            enemy_processor = get_processor_id(message["x"], message["y"], sqrt_p, subgrid.get_size())
-        
-                            if enemy_processor == rank:
+                        for owner, message in unit.attack_messages:
+                            if owner == LOCAL:
                                 subgrid.enqueue_from_message(message)
-                                
-                                # print for debugging purposes
-                                if DEBUG:
-                                    print("🎯 unit:", unit, "⚔️ decided to attack ➡️ enemy:", (message["x"],message["y"]), "is in rank:", enemy_processor)
-                                # set the attacked flag to true
-                                attacked = True
-
-                                    
                             else:
-                                # find the relation index of the neighbour processor and add the attack to the selected attacks list accordingly
-                                relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-                                selected_attacks[relation_index].append(message)
-                                # print for debugging purposes
-                                if DEBUG:
-                                    print("🎯 unit:", unit, "⚔️ decided to attack ➡️  enemy:", (message["x"],message["y"]), "is in rank:", enemy_processor)
-                                # set the attacked flag to true
-                                attacked = True
+                                # add the attack to the selected attacks list of the neighbour processor
+                                selected_attacks[owner].append(message)
+
+                            # print for debugging purposes
+                            if DEBUG:
+                                print("🎯 unit:", unit, "⚔️ decided to attack ➡️ enemy:", (message["x"],message["y"]), "is in rank:", get_processor_id(message["x"], message["y"], partition))
+                            if events.LOG is not None:
+                                record(events.ATTACK, unit, (message["x"], message["y"]))
+                            # set the attacked flag to true
+                            attacked = True
                         # at the end of the attack, reset the attack messages for the next round
                         unit.attack_messages = []
                                     
                     # if the unit is not an air unit, then get the attack pattern and attack the enemies
                     else:
-                        for enemy in unit.get_attack_pattern():
-                            enemy_processor = get_processor_id(enemy[0], enemy[1], sqrt_p, subgrid.get_size())
-                            # check whether the enemy is in the same processor
-                            if enemy_processor == rank:
-                                enemy_unit = subgrid.get_unit(enemy[0], enemy[1])
-                                # if there is an enemy unit, then attack the enemy if the enemy is not in the same faction
-                                if enemy_unit is not None:
-                                    if enemy_unit.faction != unit.faction:
-                                        subgrid.enqueue(enemy_unit, unit.attack)
-                                        # print for debugging purposes
-                                        if DEBUG:
-                                            print("🎯 unit:", unit, "⚔️ decided to attack ➡️ enemy:", enemy, "is in rank:", enemy_processor)
-                                        # set the attacked flag to true
-                                        attacked = True
-                                        # if the unit is a fire unit, then add the enemy to the attacked_to list due to the possible increase in attack power
-                                        if unit.faction == "Fire":
-                                            unit.attacked_to.append(enemy)
-                                    
+                        owners = target_table(partition, rank, unit.DIRECTIONS).owners_at(unit.x, unit.y)
+                        for (dx, dy), owner in zip(unit.DIRECTIONS, owners):
+                            # skip the cells outside of the battlefield
+                            if owner == OUTSIDE:
+                                continue
+                            enemy = (unit.x + dx, unit.y + dy)
+                            enemy_unit = grids[owner].get_unit(enemy[0], enemy[1])
+                            # if there is an enemy unit, then attack the enemy if the enemy is not in the same faction
+                            if enemy_unit is None or enemy_unit.faction == unit.faction:
+                                continue
+                            # enqueue the damage in the same processor or send it to the neighbour processor
+                            if owner == LOCAL:
+                                subgrid.enqueue(enemy_unit, unit.attack)
                             else:
-                                relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-                                enemy_unit = neighbour_subgrids[relation_index].get_unit(enemy[0], enemy[1])
-                                # if there is an enemy unit, then attack the enemy if the enemy is not in the same faction
-                                if enemy_unit is not None:
-                                    if enemy_unit.faction != unit.faction:
-                                        selected_attacks[relation_index].append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-                                        # print for debugging purposes
-                                        if DEBUG:
-                                            print("🎯 unit:", unit, "⚔️ decided to attack ➡️  enemy:", enemy, "is in rank:", enemy_processor)
-                                        # set the attacked flag to true
-                                        attacked = True
-                                        # if the unit is a fire unit, then add the enemy to the attacked_to list due to the possible increase in attack power
-                                        if unit.faction == "Fire":
-                                            unit.attacked_to.append(enemy)
+                                selected_attacks[owner].append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
+                            # print for debugging purposes
+                            if DEBUG:
+                                print("🎯 unit:", unit, "⚔️ decided to attack ➡️ enemy:", enemy, "is in rank:", get_processor_id(enemy[0], enemy[1], partition))
+                            if events.LOG is not None:
+                                record(events.ATTACK, unit, enemy)
+                            # set the attacked flag to true
+                            attacked = True
+                            # if the unit is a fire unit, then add the enemy to the attacked_to list due to the possible increase in attack power
+                            if unit.faction == "Fire":
+                                unit.attacked_to.append(enemy)
                 # if the unit is not attacking, then skip the attack phase and set the decision to skip to heal
                 if not attacked:
                     unit.decision = "Skip"
                     if DEBUG:
                         print("🚫 unit:", unit, "didn't attack.")
+                    if events.LOG is not None:
+                        record(events.NO_ATTACK, unit)
             
+            if timer is not None:
+                timer.lap("attack compute")
+
             # communicate the selected attacks to the neighbour processors to inform them about the attacks
             subgrid_damage_queues = [[] for i in range(8)]
-            subgrid_damage_queues = communicate(subgrid_damage_queues, selected_attacks, rank, sqrt_p, comm)
+            subgrid_damage_queues = communicate(subgrid_damage_queues, selected_attacks, rank, partition.columns, comm, topology)
             for i in range(8):
                 for message in subgrid_damage_queues[i]:
                     subgrid.enqueue_from_message(message) 
+            if timer is not None:
+                timer.lap("damage exchange")
             
-            # sync the processes and resolve the damage and healing phases
-            comm.Barrier() 
-            
+            # resolve the damage and healing phases, they only need the damage queues received above
             subgrid.resolve_damage(DEBUG)
 
-            comm.Barrier() 
-            
             subgrid.resolve_healing(DEBUG)
-            
-            comm.Barrier() 
+            if timer is not None:
+                timer.lap("resolution")
 
             # Create a list of deaths to check if the units are dead for informing the fire units
 
             neighbour_deaths = [[] for i in range(8)] 
 
-            neighbour_deaths = communicate(neighbour_deaths, [subgrid.death_queue] * 8,rank,sqrt_p,comm)
+            neighbour_deaths = communicate(neighbour_deaths, [subgrid.death_queue] * 8, rank, partition.columns, comm, topology)
+            if timer is not None:
+                timer.lap("death exchange")
 
             # inform the fire units about the deaths and increase their attack power accordingly
-            for fire_unit in subgrid.get_all_units():
-                if fire_unit.faction == "Fire":
-                    for i in range(8):
-                        for death in neighbour_deaths[i]:
-                            if death in fire_unit.attacked_to:
-                                fire_unit.increase_attack_power(DEBUG)
-                    for internal_death in subgrid.death_queue:
-                        if internal_death in fire_unit.attacked_to:
-                            fire_unit.increase_attack_power(DEBUG)
-                    fire_unit.attacked_to = []
+            resolve_rage(subgrid, neighbour_deaths, DEBUG)
             # reset the death queue for the next round
             subgrid.death_queue = []
-            
-            # sync the processes
-            comm.Barrier()
-            
-            
+            if timer is not None:
+                timer.lap("rage")
+
             # if debug mode is on, then send the subgrid back to the manager at the end of the round for debugging purposes
             if DEBUG:
                 # Send the subgrid back to the manager
-                comm.send(subgrid, dest=0, tag=102)    
-                
-    
-                comm.Barrier()
+                comm.send(subgrid, dest=0, tag=102)
+            checkpoint_round(subgrid, wave, round, rounds, grid_size)
+            replay_frame(replay, subgrid, wave, round)
 
         # check if there is any water unit in the subgrid and spawn new water units accordingly due to the water units' flood ability
-        neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100)] *8
+        if events.LOG is not None:
+            events.LOG.at(wave, rounds)
+        if timer is not None:
+            timer.at(wave, rounds)
+        neighbour_subgrids = [Grid(subgrid.get_size(), -100,-100, sparse=True)] *8
         
-        neighbour_subgrids = communicate(neighbour_subgrids, split_to_all(subgrid,[1]* 8),rank,sqrt_p,comm)
-        spawn_in_p = []
-        selected_spawns = [[] for i in range(8)]
-
-        # iterate over all units in the subgrid and check if there is any water unit
-        for unit in subgrid.get_all_units():
-            if unit.faction == "Water":
-                neighbors = subgrid.get_all_neighbors(unit.x, unit.y)
-                for neighbor in neighbors:
-                    # check if the neighbor is out of the grid
-                    if neighbor[0] < 0 or neighbor[0] >= subgrid.get_size()*sqrt_p or neighbor[1] < 0 or neighbor[1] >= subgrid.get_size()*sqrt_p:
-                        continue
-                    # check if the neighbor is in the same processor
-                    neighbor_p = get_processor_id(neighbor[0], neighbor[1], sqrt_p, subgrid.get_size())
-                    if neighbor_p == rank:
-                        neighbor_unit = subgrid.get_unit(neighbor[0], neighbor[1])
-                        # if there is no unit in the neighbor, then spawn a new water unit
-                        if neighbor_unit is None:
-                            spawn_in_p.append((neighbor[0], neighbor[1]))
-                            break
-                    else:
-                        # find the relation index of the neighbour processor
-                        relation_index = neighbor_relation(rank, neighbor_p, sqrt_p)
-                        neighbor_unit = neighbour_subgrids[relation_index].get_unit(neighbor[0], neighbor[1])
-                        # if there is no unit in the neighbor, then spawn a new water unit
-                        if neighbor_unit is None:
-                            selected_spawns[relation_index].append((neighbor[0], neighbor[1]))
-                            break
-        # spawn the water units in the same processor
+        neighbour_subgrids = communicate(neighbour_subgrids, split_to_all(subgrid,[1]* 8), rank, partition.columns, comm, topology)
+        if timer is not None:
+            timer.lap("flood halo")
+
+        # find the first empty neighbour cell of every water unit in the subgrid
+        spawn_in_p, selected_spawns = find_spawns(subgrid, neighbour_subgrids, rank, partition)
+
+        # spawn the water units in the same processor, a cell chosen by two water units gets one unit
         for spawn in spawn_in_p:
+            if subgrid.get_unit(spawn[0], spawn[1]) is not None:
+                continue
             WaterUnit(spawn[0], spawn[1], subgrid)
             # print for debugging purposes
             if DEBUG:
                 print(f"💧 {subgrid.get_unit(spawn[0], spawn[1]).faction} unit at ({spawn[0]}, {spawn[1]}) has spawned")
+            if events.LOG is not None:
+                record(events.SPAWN, subgrid.get_unit(spawn[0], spawn[1]))
+
+        if timer is not None:
+            timer.lap("flood")
 
         # communicate the selected spawns to the neighbour processors to inform them about the spawns
         spawn_queues = [[] for i in range(8)]
-        spawn_queues = communicate(spawn_queues, selected_spawns, rank, sqrt_p, comm)
+        spawn_queues = communicate(spawn_queues, selected_spawns, rank, partition.columns, comm, topology)
 
         # iterate over the spawn queues and spawn the water units in the neighbour processors
         for message in spawn_queues:
             for spawn in message:
+                if subgrid.get_unit(spawn[0], spawn[1]) is not None:
+                    continue
                 WaterUnit(spawn[0], spawn[1], subgrid)
                 # print for debugging purposes
                 if DEBUG:
                     print(f"💧 {subgrid.get_unit(spawn[0], spawn[1]).faction} unit at ({spawn[0]}, {spawn[1]}) has spawned")
+                if events.LOG is not None:
+                    record(events.SPAWN, subgrid.get_unit(spawn[0], spawn[1]))
+
+        if timer is not None:
+            timer.lap("spawn exchange")
 
         # at the end of the wave, reset the attack power of the fire units
         for fire_unit in subgrid.get_all_units():
             if fire_unit.faction == "Fire":
                 fire_unit.reset_attack_power()
+        elapsed = MPI.Wtime() - started
+        replay_frame(replay, subgrid, wave, rounds)
         
-        # sync the processes and send the subgrid back to the manager
-        comm.Barrier() 
-        comm.send(subgrid, dest=0, tag=103)
-        comm.Barrier()
-        
-    
\ No newline at end of file
+        finish_wave(subgrid, elapsed, wave, waves, grid_size)
+
+    if replay is not None:
+        replay.close()
+
+    # a restart from the checkpoint of the last wave plays no wave
+    if tile is None:
+        tile = empty_tile(partition) if units is None else restore_tile(units, partition)
+
+    # the tile of the final grid goes to the output file as its bytes
+    if OUTPUT != "pickle":
+        encoded = (tile if ENGINE == "array" else ArrayGrid.from_grid(tile)).encode(partition.width)
+        assemble_output(encoded, partition, wave_info["output"])
+
+    # release the topology, the workers play the next run of a batch on a new one
+    events.stop()
+    timing.stop()
+    cart.free()
+    return True
+
+
+# play one run on the manager, its progress goes to <output>_detailed.txt when debug mode is off
+def run(input_file, output_file, restart=None):
+    if not DEBUG:
+        sys.stdout = open(output_file[:-4] + "_detailed.txt", "w")
+    if EVENTS:
+        events.start(events.event_file(output_file, rank))
+    try:
+        manager(input_file, output_file, restart)
+    finally:
+        events.stop()
+        if not DEBUG:
+            sys.stdout.close()
+            sys.stdout = sys.__stdout__
+
+
+# input files of a batch, the arguments are input files, glob patterns or @files with one input file per line
+def batch_inputs(arguments):
+    inputs = []
+    for argument in arguments:
+        if argument.startswith("@"):
+            with open(argument[1:]) as f:
+                inputs += [line.strip() for line in f if line.strip()]
+        else:
+            inputs += sorted(glob.glob(argument)) or [argument]
+    return inputs
+
+
+# play a run of a batch, the output goes to the output directory under the name of the input file
+# returns the output file, or None when the run failed its checks
+# the whole input is read before the run, the workers wait in the run once the manager broadcast its information
+# so a wave that fails to parse halfway would hang the batch, any other error of a run ends the whole job
+def batch_run(input_file, output_dir):
+    output_file = os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0] + ".txt")
+    try:
+        check_input(input_file)
+        run(input_file, output_file)
+    except (ValueError, OSError) as error:
+        print(f"❌ {input_file}: {error}", file=sys.__stdout__)
+        return None
+    except Exception as error:
+        print(f"❌ {input_file}: {error!r}, the workers can not be brought back, ending the batch", file=sys.__stdout__)
+        comm.Abort(1)
+    return output_file
+
+
+# play all runs of a batch in this MPI job, the runs that fail their checks are reported and skipped
+def batch(output_dir, arguments):
+    inputs = batch_inputs(arguments)
+    os.makedirs(output_dir, exist_ok=True)
+    started = MPI.Wtime()
+    played = [output_file for output_file in (batch_run(input_file, output_dir) for input_file in inputs) if output_file]
+
+    # end the worker loops
+    comm.bcast(None, root=0)
+    print(f"✅ {len(played)} of {len(inputs)} runs in {MPI.Wtime() - started:.2f}s", file=sys.__stdout__)
+
+
+# take the index of the next input file of an ensemble from the shared counter on world rank 0
+def next_input(queue):
+    index = np.empty(1, dtype=np.int64)
+    queue.Lock(0, MPI.LOCK_SHARED)
+    queue.Fetch_and_op([np.ones(1, dtype=np.int64), MPI.INT64_T], [index, MPI.INT64_T], 0, 0, MPI.SUM)
+    queue.Unlock(0)
+    return int(index[0])
+
+
+# play the input files of an ensemble on the groups of ranks, every group is a manager with its workers
+# the managers take the next input file from the shared queue when they finished a run, so a long run only holds its group
+# at the end the survivors per faction of all runs are reduced to world rank 0 and written to <output_dir>/ensemble.json
+def ensemble(output_dir, arguments):
+    # every rank checks it, so the job ends on all ranks before any group starts a run
+    if CHECKPOINT is not None:
+        raise ValueError("Checkpoints can not be written in ensembles, the groups would write the same CHECKPOINT file.")
+    world = MPI.COMM_WORLD
+    counter = np.zeros(1 if world.Get_rank() == 0 else 0, dtype=np.int64)
+    queue = MPI.Win.Create(counter, comm=world)
+    inputs = batch_inputs(arguments)
+    started = MPI.Wtime()
+
+    played = []
+    if rank == 0:
+        os.makedirs(output_dir, exist_ok=True)
+        while (index := next_input(queue)) < len(inputs):
+            output_file = batch_run(inputs[index], output_dir)
+            if output_file is not None:
+                played.append((inputs[index], output_file))
+        comm.bcast(None, root=0)
+    else:
+        while worker():
+            pass
+
+    # the outputs are complete once every group ended its runs
+    world.Barrier()
+    queue.Free()
+    survivors = [(input_file, count_factions(output_file)) for input_file, output_file in played]
+    counts = np.array([count for input_file, count in survivors], dtype=np.int64).reshape(-1, 4)
+    total, minimum, maximum = np.zeros(4, dtype=np.int64), np.zeros(4, dtype=np.int64), np.zeros(4, dtype=np.int64)
+    world.Reduce(counts.sum(axis=0), total, op=MPI.SUM, root=0)
+    world.Reduce(counts.min(axis=0) if len(counts) else np.full(4, np.iinfo(np.int64).max), minimum, op=MPI.MIN, root=0)
+    world.Reduce(counts.max(axis=0) if len(counts) else np.zeros(4, dtype=np.int64), maximum, op=MPI.MAX, root=0)
+    runs = world.gather([(input_file, count.tolist()) for input_file, count in survivors], root=0)
+
+    if world.Get_rank() == 0:
+        runs = [scenario for group in runs for scenario in group]
+        factions = ["Earth", "Fire", "Water", "Air"]
+        summary = {faction: {"total": int(total[i]), "mean": float(total[i] / max(len(runs), 1)),
+                             "min": int(minimum[i]) if runs else 0, "max": int(maximum[i])} for i, faction in enumerate(factions)}
+        with open(os.path.join(output_dir, "ensemble.json"), "w") as f:
+            json.dump({"groups": -(-world.Get_size() // ENSEMBLE_GROUP), "runs": len(runs), "survivors": summary,
+                       "scenarios": {input_file: dict(zip(factions, count)) for input_file, count in runs}}, f, indent=1)
+        print(f"✅ {len(runs)} of {len(inputs)} runs on {-(-world.Get_size() // ENSEMBLE_GROUP)} groups in "
+              f"{MPI.Wtime() - started:.2f}s, survivors per run: " +
+              ", ".join(f"{faction} {summary[faction]['mean']:.1f}" for faction in factions), file=sys.__stdout__)
+
+
+#if the rank is 0, then it is the manager process, otherwise it is a worker process
+#a batch plays many input files in one job: python main.py --batch <output_dir> <input files, patterns or @list files>
+#an ensemble plays them on groups of ranks at once: python main.py --ensemble <group_size> <output_dir> <input files, ...>
+if ENSEMBLE_GROUP is not None:
+    ensemble(sys.argv[3], sys.argv[4:])
+elif len(sys.argv) > 1 and sys.argv[1] == "--batch":
+    if rank == 0:
+        batch(sys.argv[2], sys.argv[3:])
+    else:
+        while worker():
+            pass
+elif rank == 0:
+    run(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+else:
+    worker()
@@ -0,0 +1,51 @@
+import numpy as np
+from mpi4py import MPI
+
+# parallel assembly of the output file from the tiles of the workers
+# every worker encodes its tile as the bytes of the output file (see ArrayGrid.encode): a battlefield row
+# is 2 * width bytes, so the tile at x, y is the (height, 2 * width) block at row y and byte 2 * x of the file
+
+
+# gather the encoded tiles into one preallocated buffer on the manager and write it
+# encoded is None on the manager, the tiles arrive in rank order
+def gather_output(comm, encoded, partition, output_file):
+    if encoded is not None:
+        comm.Gatherv([np.ascontiguousarray(encoded), MPI.BYTE], None, root=0)
+        return None
+
+    workers = range(1, partition.get_workers() + 1)
+    sizes = np.array([0] + [2 * partition.tile(proc)[2] * partition.tile(proc)[3] for proc in workers])
+    displacements = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    received = np.empty(sizes.sum(), dtype=np.uint8)
+    comm.Gatherv([np.empty(0, dtype=np.uint8), MPI.BYTE], [received, sizes, displacements, MPI.BYTE], root=0)
+
+    # move the blocks of the tiles to their place in the battlefield rows
+    output = np.empty((partition.height, 2 * partition.width), dtype=np.uint8)
+    for proc in workers:
+        x, y, width, height = partition.tile(proc)
+        block = received[displacements[proc]:displacements[proc] + sizes[proc]]
+        output[y:y + height, 2 * x:2 * (x + width)] = block.reshape(height, 2 * width)
+    with open(output_file, "wb") as f:
+        f.write(output.tobytes())
+    return output
+
+
+# every worker writes its encoded tile at its offsets of the output file with one collective MPI-IO write
+# workers is the communicator of the worker processes, the manager takes no part in the write
+def write_output_mpiio(workers, encoded, partition, output_file):
+    x, y, width, height = partition.tile(workers.Get_rank() + 1)
+    filetype = MPI.BYTE.Create_subarray([partition.height, 2 * partition.width], [height, 2 * width], [y, 2 * x])
+    filetype.Commit()
+    fh = MPI.File.Open(workers, output_file, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+    fh.Set_size(partition.height * 2 * partition.width)
+    fh.Set_view(0, MPI.BYTE, filetype)
+    fh.Write_all([np.ascontiguousarray(encoded), MPI.BYTE])
+    fh.Close()
+    filetype.Free()
+
+
+# count the units of every faction (Earth, Fire, Water, Air) in an output file
+def count_factions(output_file):
+    with open(output_file, "rb") as f:
+        cells = np.frombuffer(f.read(), dtype=np.uint8)
+    return np.array([np.count_nonzero(cells == ord(char)) for char in "EFWA"], dtype=np.int64)
@@ -1,3 +1,6 @@
+import numpy as np
+from array_simulation import FACTION_CODES
+
 # parses the input file and returns the grid size, round, and units to be placed on the grid in the new wave
 def parse_input(input):
     with open(input) as f:
@@ -31,3 +34,46 @@ def parse_input(input):
             units.append(sub_units)
         # return the grid size, round, and units to be placed on the grid in the new wave
         return grid_size, round, units
+
+
+# streaming parser: opens the input file and returns the grid size, round, wave count and a generator
+# that reads the waves one at a time, so the simulation can start before the later waves are read
+def stream_input(input):
+    f = open(input)
+    # the first line of the input file contains the grid size, wave count, units per faction, and round
+    grid_size, wave_count, unit_per_faction, round = (int(token) for token in f.readline().split()[:4])
+    return grid_size, round, wave_count, stream_waves(f, wave_count, unit_per_faction)
+
+
+# read the waves of an open input file, every wave is an int32 array of (faction code, x, y) rows
+# in the order of the input file, with the same x and y as the tuples of parse_input
+def stream_waves(f, wave_count, unit_per_faction):
+    with f:
+        for i in range(wave_count):
+            # skip the wave header line, the header of the file is line 1 and every wave takes 5 lines
+            f.readline()
+            first = 5 * i + 3
+            rows = [parse_faction(f.readline(), unit_per_faction, first + j) for j in range(4)]
+            yield np.concatenate(rows)
+
+
+# parse the coordinates of a faction line in bulk, "E: 1 2, 3 4" places earth units on x, y = 2, 1 and 4, 3
+# raises ValueError with the line number when the faction is unknown or the line does not have unit_per_faction units
+def parse_faction(line, unit_per_faction, line_number=None):
+    where = f"line {line_number}" if line_number is not None else "faction line"
+    faction, colon, coordinates = line.partition(":")
+    if not colon or faction.strip() not in FACTION_CODES:
+        raise ValueError(f"{where}: expected a faction line like 'E: x y, x y', got {line.strip()!r}")
+    try:
+        # fromstring reads a blank string as one value, so blank lines get no coordinates instead
+        values = np.fromstring(coordinates.replace(",", " "), dtype=np.int32, sep=" ") if coordinates.strip() else \
+            np.empty(0, dtype=np.int32)
+    except ValueError:
+        raise ValueError(f"{where}: the coordinates must be integers, got {coordinates.strip()!r}") from None
+    if len(values) != 2 * unit_per_faction:
+        raise ValueError(f"{where}: expected {2 * unit_per_faction} coordinates, got {len(values)}")
+    rows = np.empty((unit_per_faction, 3), dtype=np.int32)
+    rows[:, 0] = FACTION_CODES[faction.strip()]
+    rows[:, 1] = values[1::2]
+    rows[:, 2] = values[0::2]
+    return rows
@@ -0,0 +1,99 @@
+import numpy as np
+from bisect import bisect_right
+
+# partition of the battlefield into the tiles of the worker processes
+# the tiles form a rows x columns layout: the cuts along each axis split the battlefield into
+# columns and rows, so every tile has exactly one neighbour tile in each of the 8 directions
+# tile (row, column) belongs to the worker whose cartesian coordinates are (row, column),
+# that is rank row * columns + column + 1 (rank 0 is the manager)
+
+
+# block distribution of size cells over parts blocks, the first size % parts blocks get one more cell
+# returns the parts + 1 cut positions
+def block_cuts(size, parts):
+    base, extra = divmod(size, parts)
+    return [i * base + min(i, extra) for i in range(parts + 1)]
+
+
+# cut positions that split the weights of the cells along one axis into parts blocks of about equal weight
+# every block keeps at least minimum cells
+def balanced_cuts(weights, parts, minimum=1):
+    size = len(weights)
+    cumulative = np.cumsum(weights)
+    cuts = [0]
+    for k in range(1, parts):
+        # cut after the cell whose prefix weight is the closest to the k-th share of the total weight
+        target = cumulative[-1] * k / parts
+        i = int(np.searchsorted(cumulative, target))
+        cut = i if i > 0 and target - cumulative[i - 1] < cumulative[i] - target else i + 1
+        cut = min(max(cut, cuts[-1] + minimum), size - (parts - k) * minimum)
+        cuts.append(cut)
+    cuts.append(size)
+    return cuts
+
+
+class Partition:
+
+    # x_cuts and y_cuts are the ascending cut positions along the x and y axes, from 0 to the battlefield size
+    def __init__(self, x_cuts, y_cuts):
+        self.x_cuts = list(x_cuts)
+        self.y_cuts = list(y_cuts)
+        self.columns = len(self.x_cuts) - 1
+        self.rows = len(self.y_cuts) - 1
+        # (rows, columns) of the worker layout, as used for the cartesian topology
+        self.dims = (self.rows, self.columns)
+        self.width = self.x_cuts[-1]
+        self.height = self.y_cuts[-1]
+
+    # block partition of a width x height battlefield over a rows x columns worker layout
+    @classmethod
+    def blocks(cls, width, height, rows, columns):
+        return cls(block_cuts(width, columns), block_cuts(height, rows))
+
+    # partition with the same layout whose tiles carry about equal shares of the cell weights
+    # the battlefield is cut along the weights of its columns and rows, so the tiles stay rectilinear
+    @classmethod
+    def balanced(cls, column_weights, row_weights, rows, columns, minimum=1):
+        return cls(balanced_cuts(column_weights, columns, minimum), balanced_cuts(row_weights, rows, minimum))
+
+    # get the number of worker processes
+    def get_workers(self):
+        return self.rows * self.columns
+
+    # get the (row, column) coordinates of a worker rank
+    def coords(self, rank):
+        return divmod(rank - 1, self.columns)
+
+    # get the worker rank of the tile at the given coordinates
+    def rank(self, row, column):
+        return row * self.columns + column + 1
+
+    # get the (x, y, width, height) of the tile of a worker rank
+    def tile(self, rank):
+        row, column = self.coords(rank)
+        x, y = self.x_cuts[column], self.y_cuts[row]
+        return x, y, self.x_cuts[column + 1] - x, self.y_cuts[row + 1] - y
+
+    # get the smallest (width, height) of the tiles
+    def smallest_tile(self):
+        widths = [b - a for a, b in zip(self.x_cuts, self.x_cuts[1:])]
+        heights = [b - a for a, b in zip(self.y_cuts, self.y_cuts[1:])]
+        return min(widths), min(heights)
+
+    # check if a global x, y coordinate is inside the battlefield
+    def is_inside(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    # get the worker rank owning the cell at the given global coordinates
+    def owner(self, x, y):
+        return self.rank(bisect_right(self.y_cuts, y) - 1, bisect_right(self.x_cuts, x) - 1)
+
+    # get the worker ranks owning the cells at the given arrays of global coordinates
+    def owners(self, x, y):
+        rows = np.searchsorted(self.y_cuts, y, side="right") - 1
+        columns = np.searchsorted(self.x_cuts, x, side="right") - 1
+        return rows * self.columns + columns + 1
+
+    # check if two partitions have the same tiles
+    def __eq__(self, other):
+        return isinstance(other, Partition) and (self.x_cuts, self.y_cuts) == (other.x_cuts, other.y_cuts)
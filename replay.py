@@ -0,0 +1,142 @@
+import glob
+import sys
+import numpy as np
+from array_simulation import DISPLAY_CHARS
+
+# replay stream of the battlefield, so that every round of a run can be reconstructed without a master
+# that collects the subgrids
+#
+# every worker appends the frames of its tile to its own file (<output>_replay.<rank>.bin):
+#
+#   magic      8 bytes  b"PGBRPL01"
+#   header     int64    grid size, round count
+#   chunks     one chunk per frame:
+#                int32  wave, round, keyframe, x, y, width, height, cell count
+#                int32  (cell count, 4) rows of x, y, faction code, hp
+#
+# a frame is the state at the end of a round, round == round count is the end of the wave after the flood
+# a delta chunk only has the cells that changed since the last frame of the worker, an empty cell has faction 0
+# a keyframe chunk clears the tile at x, y of the given width and height and has all its occupied cells
+# all workers write keyframes every KEYFRAME_INTERVAL frames, and a worker also writes one when its tile moved
+
+MAGIC = b"PGBRPL01"
+HEADER_FIELDS = 2
+HEADER_SIZE = len(MAGIC) + 8 * HEADER_FIELDS
+CHUNK_FIELDS = 8
+CELL_FIELDS = 4
+
+# frames between two keyframes of all workers
+KEYFRAME_INTERVAL = 16
+
+
+# the replay file of a worker for the output file of the run
+def replay_file(output_file, rank):
+    return f"{output_file[:-4]}_replay.{rank}.bin"
+
+
+# writer of the replay stream of one tile
+class ReplayWriter:
+
+    def __init__(self, path, grid_size, rounds):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        np.array([grid_size, rounds], dtype=np.int64).tofile(self.file)
+        self.rounds = rounds
+        # the faction and hp columns and the tile of the last frame
+        self.faction = None
+        self.hp = None
+        self.tile = None
+
+    # append the frame of the given wave and round, faction and hp are the (height, width) columns of the tile at x, y
+    def frame(self, wave, round, x, y, faction, hp):
+        tile = (x, y, faction.shape[1], faction.shape[0])
+        keyframe = self.tile != tile or (wave * (self.rounds + 1) + round) % KEYFRAME_INTERVAL == 0
+        changed = faction > 0 if keyframe else (faction != self.faction) | (hp != self.hp)
+
+        rows, columns = np.nonzero(changed)
+        cells = np.stack([columns + x, rows + y, faction[rows, columns], hp[rows, columns]], axis=1).astype(np.int32)
+        np.array([wave, round, keyframe, *tile, len(cells)], dtype=np.int32).tofile(self.file)
+        cells.tofile(self.file)
+
+        self.faction, self.hp, self.tile = faction.copy(), hp.copy(), tile
+
+    def close(self):
+        self.file.close()
+
+
+# reader of the replay streams of all workers of a run
+class Replay:
+
+    def __init__(self, output_file):
+        self.paths = sorted(glob.glob(f"{output_file[:-4]}_replay.*.bin"))
+        if not self.paths:
+            raise ValueError(f"There is no replay of {output_file}.")
+
+        # index the chunks of all files as (frame, keyframe, path, offset of the cells, cell count, tile)
+        chunks = []
+        for path in self.paths:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} is not a replay.")
+                self.grid_size, self.rounds = (int(value) for value in np.fromfile(f, dtype=np.int64, count=HEADER_FIELDS))
+                offset = HEADER_SIZE
+                while True:
+                    header = np.fromfile(f, dtype=np.int32, count=CHUNK_FIELDS)
+                    if len(header) < CHUNK_FIELDS:
+                        break
+                    wave, round, keyframe, x, y, width, height, count = (int(value) for value in header)
+                    offset += 4 * CHUNK_FIELDS
+                    chunks.append((self.key(wave, round), keyframe, path, offset, count, (x, y, width, height)))
+                    offset += 4 * CELL_FIELDS * count
+                    f.seek(offset)
+        chunks.sort(key=lambda chunk: chunk[0])
+        self.chunks = chunks
+
+    # position of a frame in the stream
+    def key(self, wave, round):
+        return wave * (self.rounds + 1) + round
+
+    # get the (wave, round) of all frames of the run
+    def frames(self):
+        return sorted({divmod(chunk[0], self.rounds + 1) for chunk in self.chunks})
+
+    # reconstruct the faction and hp columns of the battlefield at the end of the given round of the given wave
+    def frame(self, wave, round):
+        key = self.key(wave, round)
+
+        # every tile is complete from the last keyframe of its worker, so start at the earliest of them
+        last = {}
+        for chunk in self.chunks:
+            if chunk[1] and chunk[0] <= key:
+                last[chunk[2]] = chunk[0]
+        start = min(last.values(), default=0)
+
+        faction = np.zeros((self.grid_size, self.grid_size), dtype=np.int8)
+        hp = np.zeros((self.grid_size, self.grid_size), dtype=np.int16)
+        files = {path: open(path, "rb") for path in self.paths}
+        for chunk_key, keyframe, path, offset, count, (x, y, width, height) in self.chunks:
+            if chunk_key < start:
+                continue
+            if chunk_key > key:
+                break
+            if keyframe:
+                faction[y:y + height, x:x + width] = 0
+                hp[y:y + height, x:x + width] = 0
+            files[path].seek(offset)
+            cells = np.fromfile(files[path], dtype=np.int32, count=CELL_FIELDS * count).reshape(-1, CELL_FIELDS)
+            faction[cells[:, 1], cells[:, 0]] = cells[:, 2]
+            hp[cells[:, 1], cells[:, 0]] = cells[:, 3]
+        for f in files.values():
+            f.close()
+        return faction, hp
+
+    # text of the battlefield at the end of the given round like the output file
+    def text(self, wave, round):
+        faction = self.frame(wave, round)[0]
+        return "".join(" ".join(row) + "\n" for row in DISPLAY_CHARS[faction])
+
+
+# print a frame of a run from the command line: python replay.py <output_file> <wave> <round>
+# waves and rounds are counted from 1 like the debug output, round <round count> + 1 is the end of the wave
+if __name__ == "__main__":
+    print(Replay(sys.argv[1]).text(int(sys.argv[2]) - 1, int(sys.argv[3]) - 1), end="")
@@ -0,0 +1,125 @@
+import sys
+import numpy as np
+from parser import stream_input
+
+# binary scenario format, so that every worker reads the units of its own tile straight from the file
+#
+#   magic      8 bytes  b"PGBSCN01"
+#   header     int64    grid size, wave count, round count, unit count
+#   index      int64    (wave count, grid size + 1) offsets of the units of every row of every wave
+#   faction    int8     faction code of every unit, padded to 8 bytes
+#   x, y       int32    coordinates of every unit
+#
+# the units of a wave are sorted by row (y) and then by x, units on the same cell keep the order of the
+# input so that the first one still wins, and the units of row y of wave w are index[w, y]:index[w, y + 1]
+# the row index works for every worker layout, also after the battlefield is repartitioned
+
+MAGIC = b"PGBSCN01"
+HEADER_FIELDS = 4
+
+
+# check if the file is a binary scenario
+def is_scenario(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# write the waves of (faction code, x, y) rows (see parser.stream_waves) as a binary scenario
+# the units outside of the battlefield are dropped
+def write_scenario(path, grid_size, rounds, waves):
+    index, factions, xs, ys = [], [], [], []
+    offset = 0
+    for wave in waves:
+        wave = np.asarray(wave, dtype=np.int32).reshape(-1, 3)
+        x, y = wave[:, 1], wave[:, 2]
+        wave = wave[(0 <= x) & (x < grid_size) & (0 <= y) & (y < grid_size)]
+        wave = wave[np.lexsort((wave[:, 1], wave[:, 2]))]
+        rows = np.bincount(wave[:, 2], minlength=grid_size)
+        index.append(offset + np.concatenate([[0], np.cumsum(rows)]))
+        factions.append(wave[:, 0].astype(np.int8))
+        xs.append(wave[:, 1])
+        ys.append(wave[:, 2])
+        offset += len(wave)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        np.array([grid_size, len(index), rounds, offset], dtype=np.int64).tofile(f)
+        np.array(index, dtype=np.int64).reshape(-1, grid_size + 1).tofile(f)
+        faction = np.concatenate(factions) if factions else np.empty(0, dtype=np.int8)
+        faction.tofile(f)
+        f.write(bytes(-len(faction) % 8))
+        for column in (xs, ys):
+            (np.concatenate(column) if column else np.empty(0, dtype=np.int32)).astype(np.int32).tofile(f)
+
+
+# convert a text input file to a binary scenario
+def convert(input_file, scenario_file):
+    grid_size, rounds, wave_count, waves = stream_input(input_file)
+    write_scenario(scenario_file, grid_size, rounds, waves)
+
+
+# read-only view of a binary scenario, the arrays are memory mapped so only the units read are loaded
+class Scenario:
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a binary scenario.")
+            header = np.fromfile(f, dtype=np.int64, count=HEADER_FIELDS)
+        self.grid_size, self.wave_count, self.rounds, units = (int(value) for value in header)
+
+        offset = len(MAGIC) + header.nbytes
+        self.index = np.memmap(path, dtype=np.int64, mode="r", offset=offset, shape=(self.wave_count, self.grid_size + 1))
+        offset += self.index.nbytes
+        self.faction = np.memmap(path, dtype=np.int8, mode="r", offset=offset, shape=(units,))
+        offset += units + (-units % 8)
+        self.x = np.memmap(path, dtype=np.int32, mode="r", offset=offset, shape=(units,))
+        offset += 4 * units
+        self.y = np.memmap(path, dtype=np.int32, mode="r", offset=offset, shape=(units,))
+
+    # get the number of units of a wave
+    def count(self, wave):
+        return int(self.index[wave, -1] - self.index[wave, 0])
+
+    # get the units of the selected positions as (faction code, x, y) rows
+    def rows(self, selection):
+        return np.stack([self.faction[selection], self.x[selection], self.y[selection]], axis=1).astype(np.int32).reshape(-1, 3)
+
+    # get all units of a wave as (faction code, x, y) rows
+    def wave(self, wave):
+        return self.rows(slice(self.index[wave, 0], self.index[wave, -1]))
+
+    # get the units of a wave inside the tile at x, y of the given width and height
+    # every row of the tile is a contiguous run of units sorted by x
+    def tile(self, wave, x, y, width, height):
+        selection = []
+        for row in range(y, y + height):
+            start, end = self.index[wave, row], self.index[wave, row + 1]
+            first, last = start + np.searchsorted(self.x[start:end], [x, x + width])
+            selection.append(np.arange(first, last))
+        return self.rows(np.concatenate(selection) if selection else np.empty(0, dtype=np.int64))
+
+    # generator of all waves, like parser.stream_input
+    def waves(self):
+        for wave in range(self.wave_count):
+            yield self.wave(wave)
+
+
+# open a text input file or a binary scenario and return the grid size, round, wave count and a generator of the waves
+def open_input(path):
+    if is_scenario(path):
+        scenario = Scenario(path)
+        return scenario.grid_size, scenario.rounds, scenario.wave_count, scenario.waves()
+    return stream_input(path)
+
+
+# read the whole input once, so a malformed wave raises its ValueError before the run starts
+def check_input(path):
+    grid_size, rounds, wave_count, waves = open_input(path)
+    for wave in waves:
+        pass
+
+
+# convert a text input file to a binary scenario from the command line
+if __name__ == "__main__":
+    convert(sys.argv[1], sys.argv[2])
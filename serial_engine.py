@@ -0,0 +1,117 @@
+import numpy as np
+from array_simulation import ArrayGrid, EMPTY, OUTSIDE
+from array_engine import play_round, flood
+from scenario import open_input
+from utils import write_output
+import events
+
+# serial engine: the whole battlefield is a single ArrayGrid played in this process without MPI,
+# it runs the same round phases as the array engine of the worker processes (see array_engine.py)
+
+
+# stand-in for halo.Halo when one process owns the whole battlefield
+# there are no neighbours, so every ghost cell is outside of the battlefield
+class LocalHalo:
+
+    def __init__(self, shape):
+        # (rows, columns) of the local cells
+        self.shape = shape
+        # preallocated frames keyed by (kind, depth, fields, dtype)
+        self._frames = {}
+
+    # get the preallocated haloed frame
+    def _allocate(self, kind, depth, fields, dtype):
+        key = (kind, depth, fields, np.dtype(dtype))
+        if key not in self._frames:
+            rows, columns = self.shape
+            frame = np.zeros((fields, rows + 2 * depth, columns + 2 * depth), dtype=dtype)
+            if kind == "exchange":
+                frame[0] = OUTSIDE
+            self._frames[key] = frame
+        return self._frames[key]
+
+    # surround the local columns with depth cells outside of the battlefield
+    def exchange(self, columns, depth, dtype=np.int32):
+        rows, width = self.shape
+        frame = self._allocate("exchange", depth, len(columns), dtype)
+        for field, column in zip(frame, columns):
+            field[depth:depth + rows, depth:depth + width] = column
+        return frame
+
+    # get a zeroed haloed frame
+    def zeros(self, depth, fields, dtype=np.int32):
+        frame = self._allocate("accumulate", depth, fields, dtype)
+        frame.fill(0)
+        return frame
+
+    # get the local cells of the frame, nothing is collected in the ghost cells
+    # because the air units never move outside of the battlefield
+    def accumulate(self, frame, depth):
+        rows, width = self.shape
+        return frame[:, depth:depth + rows, depth:depth + width]
+
+
+# print all units of the grid like the manager does
+def print_units(grid):
+    for y, x in np.argwhere(grid.faction > EMPTY):
+        print(grid.describe(x, y))
+
+
+# play the whole simulation in this process and return the final ArrayGrid
+# waves are the (faction code, x, y) arrays of parser.stream_input or scenario.Scenario.waves
+def simulate(grid_size, rounds, waves, debug=False):
+    grid = ArrayGrid(grid_size)
+    halo = LocalHalo((grid_size, grid_size))
+
+    for index, wave in enumerate(waves):
+        # the first unit placed on a cell wins
+        grid.place_wave(wave.tolist())
+
+        # the grid and the units are only printed in debug mode
+        if debug:
+            print("--------------------")
+            print(f"🏄🏿 Wave {index + 1} Initialization:")
+            grid.display()
+            print("--------------------")
+            print("Units:")
+            print_units(grid)
+            print("--------------------")
+        else:
+            print(f"🏄🏿 Wave {index + 1} Initialization: {len(wave)} new units")
+
+        for round in range(rounds):
+            if events.LOG is not None:
+                events.LOG.at(index, round)
+            play_round(grid, halo, debug)
+
+            # if debug mode is on, then display the grid every round for debugging purposes
+            if debug:
+                print("--------------------")
+                print(f"🌟 Round {round + 1} End:")
+                grid.display()
+                print("--------------------")
+
+        # water units flood and fire units calm down at the end of the wave
+        if events.LOG is not None:
+            events.LOG.at(index, rounds)
+        flood(grid, halo, debug)
+        grid.reset_attack_power()
+
+        if debug:
+            print("--------------------")
+            print(f"🌊 Wave {index + 1} End:")
+            grid.display()
+            print_units(grid)
+            print("--------------------")
+        else:
+            print(f"🌊 Wave {index + 1} End")
+
+    return grid
+
+
+# simulate an input file and write the final grid to the output file
+def run(input_file, output_file, debug=False):
+    grid_size, rounds, wave_count, waves = open_input(input_file)
+    grid = simulate(grid_size, rounds, waves, debug)
+    write_output(grid, output_file)
+    return grid
@@ -1,14 +1,32 @@
 import numpy as np
+import events
+
+# grids whose share of occupied cells drops below this density keep their units in a map keyed by the cell
+# instead of the object array, they switch back to the object array above twice this density
+SPARSE_DENSITY = 0.05
+
+# the 8 neighbour cells of a cell, in the order of Grid.get_all_neighbors
+NEIGHBOR_DIRECTIONS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+# fields of the unit rows a grid is pickled with: faction code, x, y, hp, attack
+UNIT_FIELDS = 5
 
 # grid class is used to represent the grid and the units on the grid
 class Grid:
 
     # initialize the grid with the given size and offset
-    def __init__(self, size, offset_x=0, offset_y=0, message_grid=False):
+    # size is the number of columns, the grid is square unless the number of rows is given as height
+    def __init__(self, size, offset_x=0, offset_y=0, message_grid=False, height=None, sparse=False):
         self.size = size
+        self.height = size if height is None else height
+        # sparse grids keep the units in the units map keyed by the local (y, x) index, the grid array is None
+        self.sparse = sparse
+        self.units = {}
         # message_grid boolean is used when the new grid is splitted from another one to be passed to another processor
-        if not message_grid:
-            self.grid = np.full((size, size), None)
+        if sparse:
+            self.grid = None
+        elif not message_grid:
+            self.grid = np.full((self.height, size), None)
         else:
             self.grid = []
         # offset is used to keep track of the global coordinates of the grid
@@ -28,35 +46,75 @@ class Grid:
     # place a unit on the grid
     def place_unit(self, unit):
         x, y = unit.x - self.offset_x, unit.y - self.offset_y
-        if 0 <= x < self.size and 0 <= y < self.size:
-            self.grid[y, x] = unit
+        if 0 <= x < self.size and 0 <= y < self.height:
+            if self.sparse:
+                self.units[(y, x)] = unit
+            else:
+                self.grid[y, x] = unit
         else:
             print(f"Error: Coordinates ({unit.x}, {unit.y}) are out of bounds.")
 
     # get the neighbors of a cell at the given coordinates
     def get_neighbors(self, x, y):
         neighbors = []
-        directions = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
-        for dx, dy in directions:
+        for dx, dy in NEIGHBOR_DIRECTIONS:
             nx, ny = x + dx - self.offset_x, y + dy - self.offset_y
-            if 0 <= nx < self.size and 0 <= ny < self.size:
+            if 0 <= nx < self.size and 0 <= ny < self.height:
                 neighbors.append((nx + self.offset_x, ny + self.offset_y))
         return neighbors
 
     # get all the neighbors of a cell at the given coordinates (no boundary check)
     def get_all_neighbors(self, x, y):
-        neighbors = []
-        directions = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
-        for dx, dy in directions:
-            nx, ny = x + dx - self.offset_x, y + dy - self.offset_y
-            neighbors.append((nx + self.offset_x, ny + self.offset_y))
-        return neighbors
+        return [(x + dx, y + dy) for dx, dy in NEIGHBOR_DIRECTIONS]
     
+    # get the object array of the grid, sparse grids build it from the units map
+    def get_cells(self):
+        if not self.sparse:
+            return self.grid
+        cells = np.full((self.height, self.size), None)
+        for (y, x), unit in self.units.items():
+            cells[y, x] = unit
+        return cells
+
+    # switch between the sparse units map and the dense object array
+    def set_sparse(self, sparse):
+        if sparse == self.sparse:
+            return
+        if sparse:
+            self.units = {(int(y), int(x)): self.grid[y, x] for y, x in zip(*np.nonzero(self.grid != None))}
+            self.grid = None
+        else:
+            self.grid = self.get_cells()
+            self.units = {}
+        self.sparse = sparse
+
+    # pick the storage for the current density of the grid
+    def update_storage(self):
+        density = self.count_units() / max(self.size * self.height, 1)
+        if self.sparse and density > 2 * SPARSE_DENSITY:
+            self.set_sparse(False)
+        elif not self.sparse and density < SPARSE_DENSITY:
+            self.set_sparse(True)
+
+    # get a sparse grid with the units of the local window of the given size at the local x, y index
+    # it only carries the occupied cells, so it is used to pass the boundary cells to the neighbours
+    def window(self, x, y, width, height):
+        window = Grid(width, self.offset_x + x, self.offset_y + y, height=height, sparse=True)
+        if self.sparse:
+            for (j, i), unit in self.units.items():
+                if y <= j < y + height and x <= i < x + width:
+                    window.units[(j - y, i - x)] = unit
+        else:
+            block = self.grid[y:y + height, x:x + width]
+            for j, i in zip(*np.nonzero(block != None)):
+                window.units[(int(j), int(i))] = block[j, i]
+        return window
+
     # display the grid
     def display(self):
-        print("  " + " ".join(str(i + self.offset_x) for i in range(self.grid.shape[1])))
+        print("  " + " ".join(str(i + self.offset_x) for i in range(self.size)))
         display_rows = []
-        for idx, row in enumerate(self.grid):
+        for idx, row in enumerate(self.get_cells()):
             display_row = [
                 cell.faction[0] if isinstance(cell, Unit) else '.' for cell in row
             ]
@@ -72,14 +130,25 @@ class Grid:
     def get_unit(self, x, y):
         """Get the unit at global coordinates (x, y) within the subgrid."""
         x, y = x - self.offset_x, y - self.offset_y  # Map global to local coordinates
-        if 0 <= x < self.size and 0 <= y < self.size:
+        if 0 <= x < self.size and 0 <= y < self.height:
+            if self.sparse:
+                return self.units.get((y, x))
             return self.grid[y, x]
         else:
             return None  # Return None for out-of-bounds access
         
     # get all the units on the grid
+    # sparse grids keep the same row by row order by sorting the (y, x) keys
     def get_all_units(self):
+        if self.sparse:
+            return [self.units[key] for key in sorted(self.units)]
         return [unit for unit in self.grid.flatten() if unit is not None]
+
+    # get the number of units on the grid
+    def count_units(self):
+        if self.sparse:
+            return len(self.units)
+        return int(np.count_nonzero(self.grid != None))
     
     # enqueue a unit to be damaged
     def enqueue(self, unit, damage):
@@ -104,6 +173,9 @@ class Grid:
             existing_unit = self.get_unit(new_x, new_y)
             if existing_unit is not None:
                 unit.upgrade(existing_unit)
+                # the upgrade is logged at the cell the units merge on, like the array engine
+                if events.LOG is not None:
+                    events.LOG.record(events.UPGRADE, events.FACTIONS.index(unit.faction), new_x, new_y)
                 if debug:
                     print(f"💪 {unit.faction} unit at ({unit.x}, {unit.y}) upgraded.")
             unit.x = new_x 
@@ -119,10 +191,14 @@ class Grid:
     # resolve the removal of the units
     def resolve_removal(self):
         for (unit,x,y) in self.removal_queue:
-            self.grid[y-self.offset_y, x-self.offset_x] = None
+            if self.sparse:
+                self.units.pop((y-self.offset_y, x-self.offset_x), None)
+            else:
+                self.grid[y-self.offset_y, x-self.offset_x] = None
         self.removal_queue = []
      
     # resolve the damage of the units
+    # the event log gets one damage event per unit with the total damage taken after the fortification of earth units
     def resolve_damage(self, debug):
         for unit, damage in self.damage_queue:
             unit.total_damage += damage
@@ -130,9 +206,14 @@ class Grid:
                 print(f"🗡️ {unit.faction} unit at ({unit.x}, {unit.y}) took 🩹 {damage} damage. 💜 HP: {unit.hp}")
         self.damage_queue = []
         for unit in self.get_all_units():
+            hp = unit.hp
             unit.get_damaged(unit.total_damage)
             unit.total_damage = 0
+            if events.LOG is not None and unit.hp < hp:
+                events.LOG.record(events.DAMAGE, events.FACTIONS.index(unit.faction), unit.x, unit.y, value=hp - unit.hp, hp=unit.hp)
             if unit.is_dead():
+                if events.LOG is not None:
+                    events.LOG.record(events.DEATH, events.FACTIONS.index(unit.faction), unit.x, unit.y, hp=unit.hp)
                 if debug:
                     print(f"💀 {unit.faction} unit at ({unit.x}, {unit.y}) has died")
                 self.death_queue.append((unit.x,unit.y))
@@ -143,6 +224,8 @@ class Grid:
         for unit in self.get_all_units():
             if unit.decision == "Skip":
                 unit.get_healed()
+                if events.LOG is not None:
+                    events.LOG.record(events.HEAL, events.FACTIONS.index(unit.faction), unit.x, unit.y, hp=unit.hp)
                 if debug:
                     print(f"😇 {unit.faction} unit at ({unit.x}, {unit.y}) healing .... HP: {unit.hp}")
 
@@ -152,7 +235,10 @@ class Grid:
     # remove a unit from the grid
     def remove_unit(self, unit):
         x, y = unit.x - self.offset_x, unit.y - self.offset_y
-        self.grid[y, x] = None
+        if self.sparse:
+            self.units.pop((y, x), None)
+        else:
+            self.grid[y, x] = None
 
     # replace a unit on the grid
     def replace_unit(self, unit, new_x, new_y):
@@ -161,25 +247,50 @@ class Grid:
         unit.y = new_y
         self.place_unit(unit)
 
+    # get the units as (faction code, x, y, hp, attack) int32 rows in global coordinates
+    def unit_rows(self):
+        rows = [(unit.CODE, unit.x, unit.y, unit.hp, unit.attack) for unit in self.get_all_units()]
+        return np.array(rows, dtype=np.int32).reshape(-1, UNIT_FIELDS)
+
+    # pickle the grid as its shape and the numeric rows of its units, the queues of a round are not sent
+    def __reduce__(self):
+        return restore_grid, (self.size, self.offset_x, self.offset_y, self.height, self.sparse, self.unit_rows())
+
     # override the string representation of the grid
     def __str__(self):
         self.display()
         return ""
 
 # unit class is used to represent the units on the grid
+# units keep no reference to the grid they are placed on and are pickled as their numeric state
 class Unit:
-    # initialize the unit with the given faction, coordinates, and grid
-    def __init__(self, faction, x, y, grid):
+    __slots__ = ("faction", "x", "y", "hp", "attack", "decision", "threshold", "heal", "maximum_hp", "total_damage")
+
+    # initialize the unit with the given faction and coordinates and place it on the grid, if one is given
+    def __init__(self, faction, x, y, grid=None):
         self.faction = faction
-        self.grid = grid
         self.x = x
         self.y = y
         self.hp = 0
+        self.attack = 0
         self.decision = "Skip"
         self.threshold = 0
         self.heal = 0
+        self.maximum_hp = 0
         self.total_damage = 0
-        self.grid.place_unit(self)
+        if grid is not None:
+            grid.place_unit(self)
+
+    # the numeric state of the unit besides its position, the rest is set by the class or reset every round
+    def __getstate__(self):
+        return self.hp, self.attack
+
+    def __setstate__(self, state):
+        self.hp, self.attack = state
+
+    # pickle the unit as its class, position, hp and attack power
+    def __reduce__(self):
+        return type(self), (self.x, self.y), self.__getstate__()
     
     # heal the unit as long as the hp does not exceed the maximum hp
     def get_healed(self):
@@ -198,7 +309,6 @@ class Unit:
     
     # get the special attack pattern of the unit
     def get_attack_pattern(self, directions):
-        n = self.grid.get_size()
         neighbors = []
         for dx, dy in directions:
             nx, ny = self.x + dx, self.y + dy
@@ -229,7 +339,12 @@ class Unit:
 
 # subclass of the unit class representing the Earth unit
 class EarthUnit(Unit):
-    def __init__(self, x, y, grid):
+    __slots__ = ()
+    # faction code (see array_simulation) and directions of the attack pattern
+    CODE = 1
+    DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+    def __init__(self, x, y, grid=None):
         # call Unit's constructor
         super().__init__('Earth', x, y, grid)  
         
@@ -246,13 +361,17 @@ class EarthUnit(Unit):
 
     # get the attack pattern of the Earth unit
     def get_attack_pattern(self):
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        return super().get_attack_pattern(directions)
+        return super().get_attack_pattern(self.DIRECTIONS)
 
 
 # subclass of the unit class representing the Fire unit
 class FireUnit(Unit):
-    def __init__(self, x, y, grid):
+    __slots__ = ("attacked_to",)
+    # faction code (see array_simulation) and directions of the attack pattern
+    CODE = 2
+    DIRECTIONS = NEIGHBOR_DIRECTIONS
+
+    def __init__(self, x, y, grid=None):
         # call Unit's constructor
         super().__init__('Fire', x, y, grid)
 
@@ -276,14 +395,21 @@ class FireUnit(Unit):
         self.attack = 4
 
     # get the attack pattern of the Fire unit
+    # all 8 neighbours, the cells outside of the battlefield are skipped by the attack phase,
+    # so the pattern does not depend on the grid the unit was created in
     def get_attack_pattern(self):
-        return self.grid.get_neighbors(self.x, self.y)
+        return [(self.x + dx, self.y + dy) for dx, dy in self.DIRECTIONS]
 
 
 # subclass of the unit class representing the Water unit
 class WaterUnit(Unit):
+    __slots__ = ()
+    # faction code (see array_simulation) and directions of the attack pattern
+    CODE = 3
+    DIRECTIONS = ((-1, -1), (1, 1), (-1, 1), (1, -1))
+
     # initialize the Water unit with the given coordinates and grid
-    def __init__(self, x, y, grid):
+    def __init__(self, x, y, grid=None):
 
         # call Unit's constructor
         super().__init__('Water', x, y, grid)
@@ -297,14 +423,22 @@ class WaterUnit(Unit):
 
     # get the attack pattern of the Water unit
     def get_attack_pattern(self):
-        directions = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
-        return super().get_attack_pattern(directions)
+        return super().get_attack_pattern(self.DIRECTIONS)
 
 
 # subclass of the unit class representing the Air unit
 class AirUnit(Unit):
+    __slots__ = ("attack_messages",)
+    # faction code (see array_simulation)
+    CODE = 4
+    # directions of the attack pattern, the 8 adjacent cells and then the cells 2 cells away behind them
+    DIRECTIONS = ((-1, -1), (1, 1), (-1, 1), (1, -1), (-1, 0), (1, 0), (0, -1), (0, 1))
+    DIRECTIONS = DIRECTIONS + tuple((2 * dx, 2 * dy) for dx, dy in DIRECTIONS)
+    # candidate moves, staying first and then the 8 neighbour cells
+    MOVES = ((0, 0),) + NEIGHBOR_DIRECTIONS
+
     # initialize the Air unit with the given coordinates and grid
-    def __init__(self, x, y, grid):
+    def __init__(self, x, y, grid=None):
 
         # call Unit's constructor
         super().__init__('Air', x, y, grid)
@@ -324,14 +458,7 @@ class AirUnit(Unit):
         
     # get the attack pattern of the Air unit
     def get_attack_pattern(self, x, y):
-        directions = [(-1, -1), (1, 1), (-1, 1), (1, -1), (-1, 0), (1, 0), (0, -1), (0, 1)]
-        additional_directions = [(2 * dx, 2 * dy) for dx, dy in directions]
-        directions = directions + additional_directions
-        neighbors = []
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            neighbors.append((nx, ny))
-        return neighbors
+        return [(x + dx, y + dy) for dx, dy in self.DIRECTIONS]
     
     
     # upgrade an air unit when two of them move the same position
@@ -339,4 +466,18 @@ class AirUnit(Unit):
         self.attack += existing_unit.attack
         self.hp += existing_unit.hp
         if self.hp > self.maximum_hp:
-            self.hp = self.maximum_hp
\ No newline at end of file
+            self.hp = self.maximum_hp
+
+
+# unit classes by the faction code
+UNIT_CLASSES = [None, EarthUnit, FireUnit, WaterUnit, AirUnit]
+
+
+# rebuild a pickled grid from its shape and the (faction code, x, y, hp, attack) rows of its units
+def restore_grid(size, offset_x, offset_y, height, sparse, rows):
+    grid = Grid(size, offset_x, offset_y, height=height, sparse=sparse)
+    for faction, x, y, hp, attack in rows.tolist():
+        unit = UNIT_CLASSES[faction](x, y, grid)
+        unit.hp = hp
+        unit.attack = attack
+    return grid
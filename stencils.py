@@ -0,0 +1,157 @@
+import numpy as np
+from array_simulation import EMPTY, EARTH, FIRE, WATER, AIR, THRESHOLD
+
+# shifted-array stencils of the array engine
+# every stencil works on haloed frames: (size + 2 * depth) sized arrays with the local cells in the middle
+# and depth ghost cells of the neighbour processors (or OUTSIDE cells) around them
+
+# attack patterns in the same order as the Unit.get_attack_pattern implementations
+EARTH_PATTERN = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+WATER_PATTERN = [(-1, -1), (1, 1), (-1, 1), (1, -1)]
+FIRE_PATTERN = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+AIR_PATTERN = [(-1, -1), (1, 1), (-1, 1), (1, -1), (-1, 0), (1, 0), (0, -1), (0, 1)]
+ATTACK_PATTERNS = [None, EARTH_PATTERN, FIRE_PATTERN, WATER_PATTERN, AIR_PATTERN]
+
+# candidate moves of an air unit, staying first and then the Grid.get_all_neighbors order
+MOVE_PATTERN = [(0, 0)] + FIRE_PATTERN
+
+# factions whose attack is a fixed pattern of adjacent cells
+ADJACENT_ATTACKERS = [(EARTH, EARTH_PATTERN), (FIRE, FIRE_PATTERN), (WATER, WATER_PATTERN)]
+
+
+# view of a haloed frame that holds, for every local cell, the cell dx, dy away from it
+def shifted(frame, depth, dx, dy):
+    size_y = frame.shape[-2] - 2 * depth
+    size_x = frame.shape[-1] - 2 * depth
+    return frame[..., depth + dy:depth + dy + size_y, depth + dx:depth + dx + size_x]
+
+
+# attack decision of every cell of a haloed frame, units attack unless their hp is below the threshold
+def decisions(faction, hp):
+    return (faction > EMPTY) & (hp >= THRESHOLD[np.maximum(faction, EMPTY)])
+
+
+# attack phase of the earth, fire and water units
+# takes the haloed faction, hp and attack frames and returns, for the local cells,
+# the total damage they receive, whether the unit attacked someone and the fire targets
+# fire_targets[i] marks the fire units that attacked the cell FIRE_PATTERN[i] away from them
+def adjacent_attacks(faction, hp, attack, depth):
+    local_faction = shifted(faction, depth, 0, 0)
+    deciding = decisions(faction, hp)
+
+    damage = np.zeros(local_faction.shape, dtype=np.int32)
+    attacked = np.zeros(local_faction.shape, dtype=bool)
+    fire_targets = np.zeros((len(FIRE_PATTERN),) + local_faction.shape, dtype=bool)
+
+    for unit_faction, pattern in ADJACENT_ATTACKERS:
+        attackers = deciding & (faction == unit_faction)
+        enemies = (faction > EMPTY) & (faction != unit_faction)
+        local_attackers = shifted(attackers, depth, 0, 0)
+        local_enemies = shifted(enemies, depth, 0, 0)
+        for i, (dx, dy) in enumerate(pattern):
+            # incoming damage from the attacker dx, dy behind the cell
+            hit = shifted(attackers, depth, -dx, -dy) & local_enemies
+            np.add(damage, shifted(attack, depth, -dx, -dy), out=damage, where=hit)
+
+            # outgoing attack to the target dx, dy ahead of the unit
+            target = local_attackers & shifted(enemies, depth, dx, dy)
+            attacked |= target
+            if unit_faction == FIRE:
+                fire_targets[i] = target
+
+    return damage, attacked, fire_targets
+
+
+# targets of the attacks of the units on the local cells, for the event log
+# returns (attackers, dx, dy) layers: the unit on every local cell of attackers attacked the enemy dx, dy away from it,
+# in the order of the patterns like the object engine, the air units hit the second cell of a ray when the first is empty
+def attack_targets(faction, hp, depth):
+    local_faction = shifted(faction, depth, 0, 0)
+    deciding = shifted(decisions(faction, hp), depth, 0, 0)
+    targets = []
+    for unit_faction, pattern in ADJACENT_ATTACKERS:
+        attackers = deciding & (local_faction == unit_faction)
+        for dx, dy in pattern:
+            target = shifted(faction, depth, dx, dy)
+            targets.append((attackers & (target > EMPTY) & (target != unit_faction), dx, dy))
+
+    attackers = deciding & (local_faction == AIR)
+    for dx, dy in AIR_PATTERN:
+        first = shifted(faction, depth, dx, dy)
+        second = shifted(faction, depth, 2 * dx, 2 * dy)
+        targets.append((attackers & (first > EMPTY) & (first != AIR), dx, dy))
+        targets.append((attackers & (first <= EMPTY) & (second > EMPTY) & (second != AIR), 2 * dx, 2 * dy))
+    return targets
+
+
+# number of the enemies each fire unit attacked that died, died is a haloed boolean frame
+def fire_kills(fire_targets, died, depth):
+    kills = np.zeros(fire_targets.shape[1:], dtype=np.int32)
+    for targets, (dx, dy) in zip(fire_targets, FIRE_PATTERN):
+        kills += targets & shifted(died, depth, dx, dy)
+    return kills
+
+
+# enemy hits of an air unit standing at every cell of a haloed frame cropped by 2 cells, one layer per AIR_PATTERN ray
+# the ray hits the first unit up to 2 cells away unless it is another air unit
+# also returns the hits of the second cells alone, used when the first cell is the one the unit moves out of
+def air_rays(faction):
+    hits = []
+    second_hits = []
+    for dx, dy in AIR_PATTERN:
+        first = shifted(faction, 2, dx, dy)
+        second = shifted(faction, 2, 2 * dx, 2 * dy)
+        second_enemy = (second > EMPTY) & (second != AIR)
+        hits.append(((first > EMPTY) & (first != AIR)) | ((first <= EMPTY) & second_enemy))
+        second_hits.append(second_enemy)
+    return np.array(hits), np.array(second_hits)
+
+
+# best move of the air units, as an index of MOVE_PATTERN for every local cell of the haloed faction frame
+# the reachable-enemy count is computed once for every cell, a move adjusts it for the ray through the cell
+# the unit leaves, and argmax keeps the first best candidate so staying wins the ties like in simulate_movement
+def air_moves(faction, depth):
+    hits, second_hits = air_rays(faction)
+    count = hits.sum(axis=0, dtype=np.int16)
+    margin = depth - 2
+
+    scores = np.empty((len(MOVE_PATTERN),) + shifted(faction, depth, 0, 0).shape, dtype=np.int16)
+    scores[0] = shifted(count, margin, 0, 0)
+    for k, (dx, dy) in enumerate(MOVE_PATTERN[1:], 1):
+        back = AIR_PATTERN.index((-dx, -dy))
+        moved = count - hits[back] + second_hits[back]
+        # the unit can only move to empty cells inside the battlefield
+        scores[k] = np.where(shifted(faction, depth, dx, dy) == EMPTY, shifted(moved, margin, dx, dy), -1)
+    return scores.argmax(axis=0)
+
+
+# attack phase of the air units
+# returns, for the local cells, the total damage they receive from the air units and whether the air unit attacked
+def air_attacks(faction, hp, attack, depth):
+    attackers = decisions(faction, hp) & (faction == AIR)
+    local_enemies = shifted((faction > EMPTY) & (faction != AIR), depth, 0, 0)
+
+    damage = np.zeros(local_enemies.shape, dtype=np.int32)
+    for dx, dy in AIR_PATTERN:
+        # the attacker right behind the cell
+        near = shifted(attackers, depth, -dx, -dy) & local_enemies
+        np.add(damage, shifted(attack, depth, -dx, -dy), out=damage, where=near)
+        # the attacker 2 cells behind the cell, when the cell between them is empty
+        far = shifted(attackers, depth, -2 * dx, -2 * dy) & (shifted(faction, depth, -dx, -dy) <= EMPTY) & local_enemies
+        np.add(damage, shifted(attack, depth, -2 * dx, -2 * dy), out=damage, where=far)
+
+    hits = air_rays(faction)[0]
+    attacked = shifted(attackers, depth, 0, 0) & shifted(hits.any(axis=0), depth - 2, 0, 0)
+    return damage, attacked
+
+
+# cells of the local subgrid the water units flood at the end of the wave
+# every water unit of the haloed frame floods its first empty neighbour in the Grid.get_all_neighbors order
+def flood_spawns(faction, depth):
+    flooding = shifted(faction, 1, 0, 0) == WATER
+    spawns = np.zeros(shifted(faction, depth, 0, 0).shape, dtype=bool)
+    for dx, dy in FIRE_PATTERN:
+        chosen = flooding & (shifted(faction, 1, dx, dy) == EMPTY)
+        flooding &= ~chosen
+        spawns |= shifted(chosen, depth - 1, -dx, -dy)
+    return spawns
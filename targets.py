@@ -0,0 +1,71 @@
+import numpy as np
+
+# precomputed target tables of the object engine
+# a table holds, for every cell of a tile and its depth ghost cells, the owner of the cell each direction of a
+# pattern leads to, so the round phases look the owners of the targets up by the index of the cell instead of
+# building the target coordinates and finding their processor (partition.owner) and relation every round
+#
+# the owner is the relation index (0-7) of the neighbour tile, LOCAL for the cells of the tile itself and
+# OUTSIDE for the cells outside of the battlefield, so the unit on a target cell is found in
+# (neighbour_subgrids + [subgrid])[owner]
+
+# relation index by the (column, row) step from one processor to the other (see utils.neighbor_relation)
+RELATIONS = {(0, 1): 0, (0, -1): 1, (1, 0): 2, (-1, 0): 3, (-1, 1): 4, (-1, -1): 5, (1, 1): 6, (1, -1): 7}
+
+# owner codes of the cells of the tile and of the cells outside of the battlefield
+LOCAL = 8
+OUTSIDE = -1
+
+# owner code by the (row step + 1, column step + 1) from the tile to the tile of the target
+STEPS = np.full((3, 3), LOCAL, dtype=np.int8)
+for (step_x, step_y), relation in RELATIONS.items():
+    STEPS[step_y + 1, step_x + 1] = relation
+
+# the tables of the current tile of this process, keyed by the tile, the battlefield size, the directions and the depth
+TABLES = {}
+
+
+class TargetTable:
+
+    # tile is the (x, y, width, height) of the tile, bounds the (width, height) of the battlefield
+    # the tiles around the tile have to be at least as wide as the reach of the directions plus depth,
+    # target_table checks it on the partition
+    def __init__(self, tile, bounds, directions, depth):
+        self.x, self.y, self.width, self.height = tile
+        self.directions = directions
+        self.depth = depth
+        self.stride = self.width + 2 * depth
+
+        # global coordinates of the targets of every cell of the haloed tile, one row per cell
+        y, x = np.mgrid[self.y - depth:self.y + self.height + depth, self.x - depth:self.x + self.width + depth]
+        target_x = x.reshape(-1, 1) + np.array([dx for dx, dy in directions])
+        target_y = y.reshape(-1, 1) + np.array([dy for dx, dy in directions])
+
+        step_x = (target_x >= self.x + self.width).astype(int) - (target_x < self.x)
+        step_y = (target_y >= self.y + self.height).astype(int) - (target_y < self.y)
+        self.owners = STEPS[step_y + 1, step_x + 1]
+        outside = (target_x < 0) | (target_y < 0) | (target_x >= bounds[0]) | (target_y >= bounds[1])
+        self.owners[outside] = OUTSIDE
+
+    # get the owners of the targets of the cell at the given global coordinates, in the order of the directions
+    def owners_at(self, x, y):
+        return self.owners[(y - self.y + self.depth) * self.stride + x - self.x + self.depth].tolist()
+
+
+# get the target table of the directions for the tile of a worker rank, it is built once per run and tile
+# depth is the number of ghost cells around the tile whose targets are in the table too
+# the tables of the last tile are dropped when the tile moves (repartitioning, the next run of a batch)
+# raises ValueError when a target can be more than one tile away, the owners are only found in the adjacent tiles
+def target_table(partition, rank, directions, depth=0):
+    key = (partition.tile(rank), partition.width, partition.height, directions, depth)
+    if key not in TABLES:
+        width, height = partition.smallest_tile()
+        reach_x = max(abs(dx) for dx, dy in directions) + depth
+        reach_y = max(abs(dy) for dx, dy in directions) + depth
+        if (partition.columns > 1 and width < reach_x) or (partition.rows > 1 and height < reach_y):
+            raise ValueError(f"The target table needs tiles of at least {reach_x}x{reach_y} cells along the split axes, "
+                             f"the smallest tile is {width}x{height}.")
+        if any(other[:3] != key[:3] for other in TABLES):
+            TABLES.clear()
+        TABLES[key] = TargetTable(key[0], key[1:3], directions, depth)
+    return TABLES[key]
@@ -0,0 +1,25 @@
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+
+# the modules of the simulation live next to main.py
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+# run a python script of the simulation under mpiexec, skipped when MPI is not installed
+# mpiexec(ranks, script, *arguments) returns the finished process with its stdout and stderr
+@pytest.fixture
+def mpiexec():
+    pytest.importorskip("mpi4py")
+    if shutil.which("mpiexec") is None:
+        pytest.skip("mpiexec is not installed")
+    env = dict(os.environ, PYTHONPATH=ROOT, OMPI_ALLOW_RUN_AS_ROOT="1", OMPI_ALLOW_RUN_AS_ROOT_CONFIRM="1",
+               OMPI_MCA_rmaps_base_oversubscribe="1")
+
+    def run(ranks, script, *arguments, timeout=120):
+        return subprocess.run(["mpiexec", "-n", str(ranks), sys.executable, script, *arguments],
+                              capture_output=True, text=True, timeout=timeout, env=env)
+    return run
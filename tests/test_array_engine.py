@@ -0,0 +1,89 @@
+import glob
+import os
+import numpy as np
+import pytest
+import events
+from array_engine import attack, MOVEMENT_DEPTH
+from array_simulation import ArrayGrid, EMPTY, AIR
+from active import active_windows
+from partition import Partition
+from serial_engine import LocalHalo
+from utils import get_air_attack_pattern
+from test_serial_engine import random_input
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main.py")
+
+
+# a battlefield with units of every faction on about half of the cells, some below their attack threshold
+def random_grid(size, seed):
+    rng = np.random.default_rng(seed)
+    grid = ArrayGrid(size)
+    for y, x in np.argwhere(rng.random((size, size)) < 0.5):
+        grid.place_state(int(rng.integers(1, 5)), int(x), int(y), int(rng.integers(1, 11)), int(rng.integers(1, 4)))
+    return grid
+
+
+# the targets of the object engine (see main.worker), the whole battlefield is the tile of rank 1
+def object_attacks(grid):
+    partition = Partition.blocks(grid.size, grid.size, 1, 1)
+    subgrid = grid.to_grid()
+    attacks = []
+    for unit in subgrid.get_all_units():
+        if unit.decide() != "Attack":
+            continue
+        if unit.faction == "Air":
+            messages = get_air_attack_pattern(unit, unit.x, unit.y, subgrid, [None] * 8, 1, partition)
+            attacks += [(unit.x, unit.y, message["x"], message["y"]) for owner, message in messages]
+            continue
+        for dx, dy in unit.DIRECTIONS:
+            x, y = unit.x + dx, unit.y + dy
+            if partition.is_inside(x, y) and subgrid.get_unit(x, y) is not None and subgrid.get_unit(x, y).faction != unit.faction:
+                attacks.append((unit.x, unit.y, x, y))
+    return sorted(attacks)
+
+
+# the array engine records one attack event per target with its position, like the object engine
+@pytest.mark.parametrize("active", [False, True])
+def test_attack_events_match_object_engine(tmp_path, active):
+    grid = random_grid(20, seed=3)
+    halo = LocalHalo((grid.height, grid.size))
+    windows = active_windows(halo.exchange([grid.faction], MOVEMENT_DEPTH, np.int8)[0], MOVEMENT_DEPTH) if active else None
+
+    events.start(str(tmp_path / "events.bin"))
+    try:
+        attack(grid, halo, False, windows)
+    finally:
+        events.stop()
+    records = np.fromfile(tmp_path / "events.bin", dtype=events.EVENT)
+
+    attacks = records[records["kind"] == events.ATTACK]
+    assert sorted(zip(*(attacks[field].tolist() for field in ("x", "y", "target_x", "target_y")))) == object_attacks(grid)
+    assert np.any(attacks["faction"] == AIR)
+    assert np.all(records["faction"] > EMPTY)
+
+
+# play an input file on the workers of main.py with the given engine and the event log on, returns all event records
+def worker_events(mpiexec, tmp_path, input_file, engine):
+    with open(MAIN) as f:
+        source = f.read()
+    assert 'ENGINE = "object"' in source and "EVENTS = False" in source
+    script = str(tmp_path / f"main_{engine}.py")
+    with open(script, "w") as f:
+        f.write(source.replace('ENGINE = "object"', f'ENGINE = "{engine}"', 1).replace("EVENTS = False", "EVENTS = True", 1))
+
+    output_file = str(tmp_path / f"{engine}.txt")
+    result = mpiexec(5, script, input_file, output_file)
+    assert result.returncode == 0, result.stderr
+    return np.concatenate([np.fromfile(path, dtype=events.EVENT) for path in glob.glob(f"{output_file[:-4]}_events.*.bin")])
+
+
+# both engines log the same events for the same input, so the merged event text does not depend on the engine
+def test_events_match_object_engine(tmp_path, mpiexec):
+    input_file = str(tmp_path / "input.txt")
+    random_input(input_file, 40, waves=3, units=60, rounds=4, seed=11)
+    logs = {engine: worker_events(mpiexec, tmp_path, input_file, engine) for engine in ("object", "array")}
+
+    for kind in range(events.SPAWN + 1):
+        object_events, array_events = (sorted(log[log["kind"] == kind].tolist()) for log in logs.values())
+        assert object_events, f"no events of kind {kind}"
+        assert object_events == array_events, f"the events of kind {kind} differ"
@@ -0,0 +1,31 @@
+import os
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main.py")
+
+# a battlefield larger than SERIAL_GRID_SIZE, so the runs are played by the workers
+GOOD = """40 2 2 3
+Wave 1:
+E: 0 0, 10 10
+F: 0 1, 20 20
+W: 30 30, 39 39
+A: 5 5, 35 2
+Wave 2:
+E: 1 0, 11 10
+F: 1 1, 21 20
+W: 31 30, 38 39
+A: 6 5, 34 2
+"""
+
+
+# the second wave of the bad input only fails to parse after the workers started the run
+def test_batch_skips_malformed_input(tmp_path, mpiexec):
+    (tmp_path / "a_bad.txt").write_text(GOOD.replace("F: 1 1, 21 20", "F: 1 1, 21"))
+    (tmp_path / "b_good.txt").write_text(GOOD)
+    outputs = tmp_path / "outputs"
+    result = mpiexec(3, MAIN, "--batch", str(outputs), str(tmp_path / "a_bad.txt"), str(tmp_path / "b_good.txt"))
+
+    assert result.returncode == 0, result.stderr
+    assert "❌" in result.stdout and "line 9" in result.stdout
+    assert "1 of 2 runs" in result.stdout
+    assert not (outputs / "a_bad.txt").exists()
+    assert (outputs / "b_good.txt").exists()
@@ -0,0 +1,35 @@
+import os
+import numpy as np
+import pytest
+
+MPI = pytest.importorskip("mpi4py.MPI")
+from checkpoint import write_checkpoint, read_checkpoint, UNIT_FIELDS
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.bin")
+    units = np.array([[1, 0, 0, 10, 2], [2, 5, 3, 12, 4], [3, 7, 7, 1, 3], [4, 2, 6, 9, 2]], dtype=np.int32)
+    write_checkpoint(MPI.COMM_SELF, units, 8, 2, 3, path)
+    assert not os.path.exists(path + ".partial")
+
+    grid_size, wave, round, restored = read_checkpoint(path)
+    assert (grid_size, wave, round) == (8, 2, 3)
+    assert restored.tolist() == units.tolist()
+
+
+# a newer checkpoint replaces the last one, also when the battlefield is empty
+def test_empty_checkpoint_replaces_last(tmp_path):
+    path = str(tmp_path / "checkpoint.bin")
+    write_checkpoint(MPI.COMM_SELF, np.ones((3, UNIT_FIELDS), dtype=np.int32), 8, 0, 1, path)
+    write_checkpoint(MPI.COMM_SELF, np.empty((0, UNIT_FIELDS), dtype=np.int32), 8, 1, 0, path)
+
+    grid_size, wave, round, restored = read_checkpoint(path)
+    assert (grid_size, wave, round) == (8, 1, 0)
+    assert restored.shape == (0, UNIT_FIELDS)
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("8 1 1 1\n")
+    with pytest.raises(ValueError, match="not a checkpoint"):
+        read_checkpoint(str(path))
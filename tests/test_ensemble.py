@@ -0,0 +1,21 @@
+import os
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main.py")
+
+
+# the groups of an ensemble would write the same checkpoint file, so the ensemble stops before its first run
+def test_ensemble_rejects_checkpoints(tmp_path, mpiexec):
+    with open(MAIN) as f:
+        source = f.read()
+    assert "CHECKPOINT = None" in source
+    script = str(tmp_path / "main.py")
+    with open(script, "w") as f:
+        f.write(source.replace("CHECKPOINT = None", f"CHECKPOINT = {str(tmp_path / 'checkpoint.bin')!r}", 1))
+    (tmp_path / "input.txt").write_text("40 1 1 1\nWave 1:\nE: 0 0\nF: 1 1\nW: 2 2\nA: 3 3\n")
+
+    outputs = tmp_path / "outputs"
+    result = mpiexec(4, script, "--ensemble", "2", str(outputs), str(tmp_path / "input.txt"))
+    assert result.returncode != 0
+    assert "Checkpoints can not be written in ensembles" in result.stderr
+    assert not (outputs / "ensemble.json").exists()
+    assert not (tmp_path / "checkpoint.bin").exists()
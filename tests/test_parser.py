@@ -0,0 +1,64 @@
+import pytest
+from parser import parse_input, parse_faction, stream_input
+from array_simulation import EARTH, WATER
+
+EXAMPLE = """8 2 2 4
+Wave 1:
+E: 0 0, 1 1
+F: 2 2, 3 3
+W: 4 4, 4 5
+A: 6 6, 7 7
+Wave 2:
+E: 1 0, 2 1
+F: 3 2, 4 3
+W: 5 4, 6 5
+A: 7 6, 0 7
+"""
+
+
+def write(tmp_path, text):
+    path = tmp_path / "input.txt"
+    path.write_text(text)
+    return str(path)
+
+
+def test_stream_input_matches_parse_input(tmp_path):
+    path = write(tmp_path, EXAMPLE)
+    grid_size, rounds, wave_count, waves = stream_input(path)
+    assert (grid_size, rounds, wave_count) == (8, 4, 2)
+    codes = {"E": 1, "F": 2, "W": 3, "A": 4}
+    for streamed, parsed in zip(waves, parse_input(path)[2]):
+        assert streamed.tolist() == [[codes[faction[0]], x, y] for faction, x, y in parsed]
+
+
+def test_parse_faction():
+    assert parse_faction("W: 1 2, 3 4\n", 2).tolist() == [[WATER, 2, 1], [WATER, 4, 3]]
+    assert parse_faction("Earth: 5 6\n", 1).tolist() == [[EARTH, 6, 5]]
+
+
+@pytest.mark.parametrize("line, message", [
+    ("E: 1 2\n", "expected 4 coordinates, got 2"),
+    ("E: 1 2, 3 4, 5 6\n", "expected 4 coordinates, got 6"),
+    ("E:\n", "expected 4 coordinates, got 0"),
+    ("\n", "expected a faction line"),
+    ("X: 1 2, 3 4\n", "expected a faction line"),
+    ("1 2, 3 4\n", "expected a faction line"),
+    ("E: 1 a, 3 4\n", "the coordinates must be integers"),
+])
+def test_parse_faction_rejects_malformed_lines(line, message):
+    with pytest.raises(ValueError, match=f"line 7: {message}"):
+        parse_faction(line, 2, 7)
+
+
+def test_stream_input_reports_the_line_of_a_truncated_wave(tmp_path):
+    path = write(tmp_path, EXAMPLE.rsplit("F:", 1)[0])
+    waves = stream_input(path)[3]
+    assert len(next(waves)) == 8
+    with pytest.raises(ValueError, match="line 9: expected a faction line"):
+        next(waves)
+
+
+def test_stream_input_reports_the_line_of_a_short_faction_line(tmp_path):
+    path = write(tmp_path, EXAMPLE.replace("W: 4 4, 4 5", "W: 4 4"))
+    with pytest.raises(ValueError, match="line 5: expected 4 coordinates, got 2"):
+        list(stream_input(path)[3])
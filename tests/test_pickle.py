@@ -0,0 +1,55 @@
+import pickle
+import pytest
+from simulation import Grid, UNIT_CLASSES, EarthUnit, FireUnit, WaterUnit, AirUnit
+
+
+def state(unit):
+    return type(unit), unit.faction, unit.x, unit.y, unit.hp, unit.attack, unit.heal, unit.threshold, unit.maximum_hp
+
+
+@pytest.mark.parametrize("unit_class", [EarthUnit, FireUnit, WaterUnit, AirUnit])
+def test_unit_round_trip(unit_class):
+    unit = unit_class(3, 5)
+    unit.hp -= 2
+    unit.attack += 1
+    copy = pickle.loads(pickle.dumps(unit, protocol=5))
+    assert state(copy) == state(unit)
+    # the round state is reset, not sent
+    assert copy.decision == "Skip" and copy.total_damage == 0
+
+
+# units are sent without their grid, a unit placed on a grid pickles to the same few bytes
+def test_unit_has_no_grid_reference():
+    grid = Grid(64)
+    unit = FireUnit(3, 5, grid)
+    assert len(pickle.dumps(unit, protocol=5)) == len(pickle.dumps(FireUnit(3, 5), protocol=5))
+    assert not hasattr(unit, "__dict__")
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_grid_round_trip(sparse):
+    grid = Grid(6, offset_x=4, offset_y=8, height=5, sparse=sparse)
+    for code, x, y in [(1, 4, 8), (2, 9, 8), (3, 5, 12), (4, 7, 10)]:
+        UNIT_CLASSES[code](x, y, grid).hp -= code
+    grid.get_unit(9, 8).attack = 7
+    grid.enqueue(grid.get_unit(4, 8), 3)
+
+    copy = pickle.loads(pickle.dumps(grid, protocol=5))
+    assert (copy.size, copy.height, copy.offset_x, copy.offset_y, copy.sparse) == (6, 5, 4, 8, sparse)
+    assert [state(unit) for unit in copy.get_all_units()] == [state(unit) for unit in grid.get_all_units()]
+    assert copy.unit_rows().tolist() == grid.unit_rows().tolist()
+    # the units are placed on the restored grid and the queues of the round stay behind
+    assert copy.get_unit(7, 10).faction == "Air"
+    assert copy.damage_queue == []
+
+
+# comm.send and the neighbour collectives pickle with MPI.pickle, the grid travels as its unit rows in the pickle
+def test_grid_size_on_the_wire():
+    MPI = pytest.importorskip("mpi4py.MPI")
+    grid = Grid(64)
+    for i in range(64):
+        EarthUnit(i, i, grid)
+    data = MPI.pickle.dumps(grid)
+    assert len(data) < 64 * 5 * 4 + 256
+    copy = MPI.pickle.loads(data)
+    assert copy.unit_rows().tolist() == grid.unit_rows().tolist()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import replay
+from replay import Replay, ReplayWriter, replay_file
+
+SIZE = 8
+ROUNDS = 3
+WAVES = 3
+
+
+# random battlefields at the end of every round, the cells of the frames change a little from round to round
+def battlefields(seed):
+    rng = np.random.default_rng(seed)
+    faction = np.zeros((SIZE, SIZE), dtype=np.int8)
+    hp = np.zeros((SIZE, SIZE), dtype=np.int16)
+    frames = {}
+    for wave in range(WAVES):
+        for round in range(ROUNDS + 1):
+            changed = rng.random((SIZE, SIZE)) < 0.2
+            faction = np.where(changed, rng.integers(0, 5, (SIZE, SIZE)), faction).astype(np.int8)
+            hp = np.where(faction > 0, np.where(changed, rng.integers(1, 20, (SIZE, SIZE)), hp), 0).astype(np.int16)
+            frames[(wave, round)] = (faction.copy(), hp.copy())
+    return frames
+
+
+# two workers split the battlefield into a left and a right tile, the cut moves in the last wave like a repartitioning
+@pytest.mark.parametrize("interval", [16, 3])
+def test_frames_round_trip(tmp_path, monkeypatch, interval):
+    monkeypatch.setattr(replay, "KEYFRAME_INTERVAL", interval)
+    output = str(tmp_path / "output.txt")
+    frames = battlefields(seed=interval)
+    writers = [ReplayWriter(replay_file(output, rank), SIZE, ROUNDS) for rank in (1, 2)]
+    for (wave, round), (faction, hp) in frames.items():
+        cut = 4 if wave < WAVES - 1 else 5
+        writers[0].frame(wave, round, 0, 0, faction[:, :cut], hp[:, :cut])
+        writers[1].frame(wave, round, cut, 0, faction[:, cut:], hp[:, cut:])
+    for writer in writers:
+        writer.close()
+
+    stream = Replay(output)
+    assert (stream.grid_size, stream.rounds) == (SIZE, ROUNDS)
+    assert stream.frames() == sorted(frames)
+    for (wave, round), (faction, hp) in frames.items():
+        replayed_faction, replayed_hp = stream.frame(wave, round)
+        assert np.array_equal(replayed_faction, faction)
+        assert np.array_equal(replayed_hp, hp)
+    assert stream.text(0, 0).count("\n") == SIZE
+
+
+def test_missing_replay(tmp_path):
+    with pytest.raises(ValueError, match="no replay"):
+        Replay(str(tmp_path / "output.txt"))
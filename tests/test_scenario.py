@@ -0,0 +1,71 @@
+import numpy as np
+from parser import stream_input
+from scenario import Scenario, write_scenario, convert, is_scenario, open_input
+
+# the second wave has a unit outside of the battlefield and two units on the same cell
+WAVES = [
+    np.array([[1, 0, 0], [2, 5, 3], [3, 1, 3], [4, 7, 7], [1, 2, 3]], dtype=np.int32),
+    np.array([[4, 3, 3], [2, 8, 1], [3, 3, 3], [1, 0, 7], [2, 6, 0]], dtype=np.int32),
+]
+
+TEXT = """8 2 1 3
+Wave 1:
+E: 0 0
+F: 3 5
+W: 3 1
+A: 7 7
+Wave 2:
+E: 7 0
+F: 1 7
+W: 2 2
+A: 5 4
+"""
+
+
+def inside(wave, grid_size):
+    x, y = wave[:, 1], wave[:, 2]
+    return wave[(0 <= x) & (x < grid_size) & (0 <= y) & (y < grid_size)]
+
+
+# sort the units of a wave by row and then by x, the order of the units on the same cell is kept
+def by_row(wave):
+    return wave[np.lexsort((wave[:, 1], wave[:, 2]))]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "scenario.bin")
+    write_scenario(path, 8, 3, WAVES)
+    assert is_scenario(path)
+
+    scenario = Scenario(path)
+    assert (scenario.grid_size, scenario.wave_count, scenario.rounds) == (8, 2, 3)
+    for w, wave in enumerate(WAVES):
+        expected = by_row(inside(wave, 8))
+        assert scenario.count(w) == len(expected)
+        assert scenario.wave(w).tolist() == expected.tolist()
+    assert [wave.tolist() for wave in scenario.waves()] == [by_row(inside(wave, 8)).tolist() for wave in WAVES]
+
+
+# the units of a tile are the units of the wave inside of it, in any worker layout
+def test_tiles(tmp_path):
+    path = str(tmp_path / "scenario.bin")
+    write_scenario(path, 8, 3, WAVES)
+    scenario = Scenario(path)
+    for w in range(2):
+        wave = scenario.wave(w)
+        for x, y, width, height in [(0, 0, 8, 8), (0, 0, 3, 4), (3, 3, 5, 5), (2, 0, 3, 8), (7, 7, 1, 1)]:
+            chosen = (x <= wave[:, 1]) & (wave[:, 1] < x + width) & (y <= wave[:, 2]) & (wave[:, 2] < y + height)
+            assert scenario.tile(w, x, y, width, height).tolist() == wave[chosen].tolist()
+
+
+def test_convert_matches_text_input(tmp_path):
+    text = tmp_path / "input.txt"
+    text.write_text(TEXT)
+    path = str(tmp_path / "scenario.bin")
+    convert(str(text), path)
+    assert not is_scenario(str(text))
+
+    grid_size, rounds, wave_count, waves = open_input(path)
+    assert (grid_size, rounds, wave_count) == (8, 3, 2)
+    streamed = stream_input(str(text))[3]
+    assert [wave.tolist() for wave in waves] == [by_row(wave).tolist() for wave in streamed]
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pytest
+import serial_engine
+from array_simulation import ArrayGrid, AIR
+from simulation import Grid
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main.py")
+
+# a battlefield larger than SERIAL_GRID_SIZE, so main.py plays it on the workers
+SIZE = 40
+
+
+# write a random input file of the text format, every unit on its own cell
+def random_input(path, size, waves, units, rounds, seed):
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        f.write(f"{size} {waves} {units} {rounds}\n")
+        for wave in range(waves):
+            f.write(f"Wave {wave + 1}:\n")
+            cells = rng.choice(size * size, size=4 * units, replace=False)
+            for faction, block in zip("EFWA", np.split(cells, 4)):
+                f.write(f"{faction}: " + ", ".join(f"{cell // size} {cell % size}" for cell in block) + "\n")
+
+
+# the serial engine plays the array engine phases on one grid, its units match the object engine units
+def test_array_grid_round_trip():
+    grid = ArrayGrid(6)
+    grid.place_wave([[1, 0, 0], [2, 1, 0], [4, 5, 5], [3, 0, 0]])
+    objects = grid.to_grid()
+    assert isinstance(objects, Grid) and objects.count_units() == 3
+    assert ArrayGrid.from_grid(objects).unit_rows().tolist() == grid.unit_rows().tolist()
+    assert grid.faction[5, 5] == AIR
+
+
+# the serial engine gives the same battlefield as the workers of both engines on the same input
+@pytest.mark.parametrize("engine", ["object", "array"])
+def test_serial_engine_matches_workers(tmp_path, mpiexec, engine):
+    input_file = str(tmp_path / "input.txt")
+    random_input(input_file, SIZE, waves=3, units=60, rounds=4, seed=7)
+    serial_engine.run(input_file, str(tmp_path / "serial.txt"))
+
+    # the engine of main.py is a constant, the workers run a copy of main.py with the other engine
+    with open(MAIN) as f:
+        source = f.read()
+    assert 'ENGINE = "object"' in source
+    script = str(tmp_path / "main.py")
+    with open(script, "w") as f:
+        f.write(source.replace('ENGINE = "object"', f'ENGINE = "{engine}"', 1))
+
+    result = mpiexec(5, script, input_file, str(tmp_path / "workers.txt"))
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / "workers.txt").read_text() == (tmp_path / "serial.txt").read_text()
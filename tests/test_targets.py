@@ -0,0 +1,35 @@
+import pytest
+from partition import Partition
+from simulation import AirUnit, NEIGHBOR_DIRECTIONS
+from targets import LOCAL, OUTSIDE, RELATIONS, target_table
+
+
+# the owner codes of the table are the relations of the ranks partition.owner finds for the targets
+@pytest.mark.parametrize("directions, depth", [(NEIGHBOR_DIRECTIONS, 0), (AirUnit.DIRECTIONS, 1)])
+def test_owners_match_partition(directions, depth):
+    partition = Partition([0, 4, 7, 12], [0, 5, 9, 12])
+    for rank in range(1, partition.get_workers() + 1):
+        table = target_table(partition, rank, directions, depth)
+        x, y, width, height = partition.tile(rank)
+        row, column = partition.coords(rank)
+        for cell_y in range(y - depth, y + height + depth):
+            for cell_x in range(x - depth, x + width + depth):
+                for (dx, dy), owner in zip(directions, table.owners_at(cell_x, cell_y)):
+                    target_x, target_y = cell_x + dx, cell_y + dy
+                    if not partition.is_inside(target_x, target_y):
+                        assert owner == OUTSIDE
+                    elif partition.owner(target_x, target_y) == rank:
+                        assert owner == LOCAL
+                    else:
+                        other_row, other_column = partition.coords(partition.owner(target_x, target_y))
+                        assert owner == RELATIONS[(other_column - column, other_row - row)]
+
+
+# the air unit attacks 2 cells away and the table covers 1 ghost cell, a 2 cells wide tile would be skipped
+def test_narrow_tiles_are_rejected():
+    partition = Partition([0, 5, 7, 12], [0, 12])
+    with pytest.raises(ValueError, match="3x3"):
+        target_table(partition, 1, AirUnit.DIRECTIONS, 1)
+    # the adjacent cells are still found in the 2 cells wide tile
+    owners = target_table(partition, 1, NEIGHBOR_DIRECTIONS).owners_at(4, 0)
+    assert owners[NEIGHBOR_DIRECTIONS.index((1, 0))] == RELATIONS[(1, 0)]
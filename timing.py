@@ -0,0 +1,84 @@
+import time
+import numpy as np
+
+# phase timers of the worker loop
+# the worker loop calls lap at the end of every phase of a round, the time since the last boundary is charged
+# to the phase, and communicate adds the time it spends in the exchanges to "communicate" on top of the phases
+#
+# the timers are off while TIMER is None, the worker loop checks it before every lap:
+#     if timing.TIMER is not None:
+#         timing.TIMER.lap("attack halo")
+#
+# hooks added with add_hook are called at every phase boundary with the phase, wave, round and elapsed seconds
+
+# phases of the object engine, of the array engine (array_engine.play_round) and of the exchanges
+PHASES = [
+    "movement halo", "movement", "movement exchange", "movement resolution",
+    "attack halo", "attack compute", "damage exchange", "resolution", "death exchange", "rage",
+    "flood halo", "flood", "spawn exchange",
+    "array movement", "array attack", "array resolution", "array rage", "array flood",
+    "communicate",
+]
+
+# the phase timer of this process, None while the timers are off
+TIMER = None
+
+# functions called at every phase boundary
+HOOKS = []
+
+
+class PhaseTimer:
+
+    def __init__(self):
+        self.totals = np.zeros(len(PHASES))
+        self.index = {phase: i for i, phase in enumerate(PHASES)}
+        self.wave = 0
+        self.round = 0
+        self.last = time.perf_counter()
+
+    # start the phases of the given wave and round
+    def at(self, wave, round):
+        self.wave, self.round = wave, round
+        self.last = time.perf_counter()
+
+    # end a phase, the time since the last boundary is charged to it
+    def lap(self, phase):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.totals[self.index[phase]] += elapsed
+        for hook in HOOKS:
+            hook(phase, self.wave, self.round, elapsed)
+        self.last = time.perf_counter()
+
+    # add time measured elsewhere to a phase without ending the current one
+    def add(self, phase, elapsed):
+        self.totals[self.index[phase]] += elapsed
+
+    # get the seconds of every phase since the last call, in the order of PHASES
+    def collect(self):
+        totals = self.totals
+        self.totals = np.zeros(len(PHASES))
+        return totals
+
+
+# start the phase timer of this process
+def start():
+    global TIMER
+    TIMER = PhaseTimer()
+
+
+# stop the phase timer of this process
+def stop():
+    global TIMER
+    TIMER = None
+
+
+# add a function called with the phase, wave, round and elapsed seconds at every phase boundary
+def add_hook(hook):
+    HOOKS.append(hook)
+
+
+# per phase summary of the min, mean and max seconds of the workers, phases no worker spent time in are left out
+def summary(minimum, total, maximum, workers):
+    return {phase: {"min": float(minimum[i]), "mean": float(total[i] / workers), "max": float(maximum[i])}
+            for i, phase in enumerate(PHASES) if maximum[i] > 0}
@@ -0,0 +1,53 @@
+from mpi4py import MPI
+
+# cartesian topology of the worker processes
+# the workers form a non-periodic rows x columns cartesian communicator, neighbours beyond the
+# battlefield borders are MPI.PROC_NULL, and a distributed graph over the existing 8 neighbours
+# carries the neighbourhood collectives (cartesian neighbourhoods only contain the 4 face neighbours)
+
+# unit offsets of the communication directions in the order used by communicate
+# 0 : below
+# 1 : above
+# 2 : right
+# 3 : left
+# 4 : below left
+# 5 : above left
+# 6 : below right
+# 7 : above right
+DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0), (-1, 1), (-1, -1), (1, 1), (1, -1)]
+OPPOSITE = [1, 0, 3, 2, 7, 6, 5, 4]
+
+
+# split the worker processes (every rank but the manager rank 0) into their own communicator
+# the manager gets MPI.COMM_NULL
+def split_workers(comm):
+    rank = comm.Get_rank()
+    return comm.Split(MPI.UNDEFINED if rank == 0 else 1, rank)
+
+
+class Topology:
+
+    # build the topology on the worker communicator, dims is (rows, columns) of the worker layout
+    def __init__(self, workers, dims):
+        self.dims = dims
+        self.cart = workers.Create_cart(dims, periods=[False, False], reorder=False)
+        self.row, self.column = self.cart.Get_coords(self.cart.Get_rank())
+
+        # cartesian rank of the neighbour in every direction
+        self.neighbours = []
+        for dx, dy in DIRECTIONS:
+            row, column = self.row + dy, self.column + dx
+            if 0 <= row < dims[0] and 0 <= column < dims[1]:
+                self.neighbours.append(self.cart.Get_cart_rank([row, column]))
+            else:
+                self.neighbours.append(MPI.PROC_NULL)
+
+        # directions with a neighbour, in the order of the graph neighbourhood
+        self.directions = [i for i in range(8) if self.neighbours[i] != MPI.PROC_NULL]
+        ranks = [self.neighbours[i] for i in self.directions]
+        self.graph = self.cart.Create_dist_graph_adjacent(ranks, ranks, reorder=False)
+
+    # release the communicators
+    def free(self):
+        self.graph.Free()
+        self.cart.Free()
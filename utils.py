@@ -1,9 +1,15 @@
-from simulation import Grid
+import events
+from simulation import AirUnit, NEIGHBOR_DIRECTIONS
+from targets import RELATIONS, LOCAL, OUTSIDE, target_table
 
-# get processor id (rank) of a given x, y coordinate
+# get processor id (rank) of a given x, y coordinate (see partition.Partition)
 
-def get_processor_id(x, y, sqrt_p, sub_grid_size):
-    return (x // sub_grid_size) + (y // sub_grid_size)*sqrt_p + 1
+def get_processor_id(x, y, partition):
+    return partition.owner(x, y)
+
+# check if a global x, y coordinate is inside the battlefield
+def is_inside(x, y, partition):
+    return partition.is_inside(x, y)
 
 # get the relation index between two processor ranks
 # 0 : below
@@ -15,186 +21,71 @@ def get_processor_id(x, y, sqrt_p, sub_grid_size):
 # 6 : below right
 # 7 : above right
 
-def neighbor_relation(pid_1, pid_2, sqrt_p):
-
-    # special case for 2x2
-    if (sqrt_p == 2):
-        if pid_1 == 1:
-            if pid_2 == 2:
-                return 2
-            elif pid_2 == 3:
-                return 0
-            else:
-                return 6
-        elif pid_1 == 2:
-            if pid_2 == 1:
-                return 3
-            elif pid_2 == 4:
-                return 0
-            else:
-                return 4
-        elif pid_1 == 3:
-            if pid_2 == 1:
-                return 1
-            elif pid_2 == 4:
-                return 2
-            else:
-                return 7
-        elif pid_1 == 4:
-            if pid_2 == 2:
-                return 1
-            elif pid_2 == 3:
-                return 3
-            else:
-                return 5
-
-    # general case        
-    else:
-        # check the relation between two processors
-
-        # check if pid_2 is below pid_1
-        if pid_1 == pid_2 - sqrt_p:
-            return 0
-        
-        # check if pid_2 is above pid_1
-        elif pid_1 == pid_2 + sqrt_p:
-            return 1
-        
-        # check if pid_2 is right of pid_1
-        elif pid_1 == pid_2 - 1:
-            return 2
-        
-        # check if pid_2 is left of pid_1
-        elif pid_1 == pid_2 + 1:
-            return 3
-        
-        # check if pid_2 is below right of pid_1
-        elif pid_1 == pid_2 - sqrt_p - 1:
-            return 6
-        
-        # check if pid_2 is below left of pid_1
-        elif pid_1 == pid_2 - sqrt_p + 1:
-            return 4
-        
-        # check if pid_2 is above right of pid_1
-        elif pid_1 == pid_2 + sqrt_p - 1:
-            return 7
-        
-        # check if pid_2 is above left of pid_1
-        elif pid_1 == pid_2 + sqrt_p + 1:
-            return 5
+def neighbor_relation(pid_1, pid_2, partition):
+
+    # compare the cartesian coordinates of the processors in the worker layout
+    row_1, column_1 = partition.coords(pid_1)
+    row_2, column_2 = partition.coords(pid_2)
+    return RELATIONS.get((column_2 - column_1, row_2 - row_1))
     
 
-# get possible attacks of an air unit using neighbor subgrids
+# get possible attacks of an air unit standing at x, y using neighbor subgrids
+# the owners of the attacked cells are looked up in the target table of the tile (see targets.py)
+# returns the attacks as (owner, message) pairs, the messages are dictionaries with the keys x, y, damage
 
-def get_air_attack_pattern(unit, air_attack_pattern, subgrid, neighbour_subgrids, rank, world_size, sqrt_p):
+def get_air_attack_pattern(unit, x, y, subgrid, neighbour_subgrids, rank, partition):
 
-    # accumulate all possible attacks as messages that are dictionaries structured
-    # with the following keys: x, y, damage
+    # the cells the unit can move to are up to 1 cell outside of the tile
+    owners = target_table(partition, rank, AirUnit.DIRECTIONS, 1).owners_at(x, y)
+    grids = neighbour_subgrids + [subgrid]
     air_messages = []
 
-    # check each neighbor for possible attacks
+    # check each direction for possible attacks
     for i in range(8):
-
-        # track the case when it is the same unit
-        collision = False
-        enemy = air_attack_pattern[i]
-        if (enemy[0],enemy[1]) == (unit.x, unit.y):
-            collision = True
-        enemy_processor = get_processor_id(enemy[0], enemy[1], sqrt_p, subgrid.get_size())
-        if enemy_processor < 1 or enemy_processor > world_size - 1:
+        dx, dy = AirUnit.DIRECTIONS[i]
+        owner = owners[i]
+        if owner == OUTSIDE:
             continue
 
-        # handle the case where the enemy is in the same processor
-        if enemy_processor == rank:
-            enemy_unit = subgrid.get_unit(enemy[0], enemy[1])
-            if collision:
-                enemy_unit = None
-            if enemy_unit is not None:
-                if enemy_unit.faction != unit.faction:
-
-                    # add the attack as a message
-                    air_messages.append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-            else:
-                # check the outer neighbors
-                enemy = air_attack_pattern[i+8]
-                enemy_processor = get_processor_id(enemy[0], enemy[1], sqrt_p, subgrid.get_size())
-                if enemy_processor < 1 or enemy_processor > world_size - 1:
-                    continue
-                if enemy_processor == rank:
-                    enemy_unit = subgrid.get_unit(enemy[0], enemy[1])
-                    if enemy_unit is not None:
-                        if enemy_unit.faction != unit.faction:
-
-                            # add the attack as a message
-
-                            air_messages.append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-                else:
-                    relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-                    enemy_unit = neighbour_subgrids[relation_index].get_unit(enemy[0], enemy[1])
-                    if enemy_unit is not None:
-                        if enemy_unit.faction != unit.faction:
-
-                            # add the attack as a message
-                            air_messages.append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-
-        # handle the case where the enemy is in a different processor                    
-        else:
-
-            relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-            enemy_unit = neighbour_subgrids[relation_index].get_unit(enemy[0], enemy[1])
-            if collision:
-                enemy_unit = None
-            if enemy_unit is not None:
-                if enemy_unit.faction != unit.faction:
-                    air_messages.append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-            else:
-                enemy = air_attack_pattern[i+8]
-                enemy_processor = get_processor_id(enemy[0], enemy[1], sqrt_p, subgrid.get_size())
-                if enemy_processor < 1 or enemy_processor > world_size - 1:
-                    continue
-                relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-                enemy_unit = neighbour_subgrids[relation_index].get_unit(enemy[0], enemy[1])
-                if enemy_unit is not None:
-                    if enemy_unit.faction != unit.faction:
-                        air_messages.append({"x": enemy[0], "y": enemy[1],  "damage": unit.attack})
-                    
+        # the cell the unit moves out of is empty
+        enemy_x, enemy_y = x + dx, y + dy
+        enemy_unit = None if (enemy_x, enemy_y) == (unit.x, unit.y) else grids[owner].get_unit(enemy_x, enemy_y)
+
+        # check the outer neighbor when the adjacent cell is empty
+        if enemy_unit is None:
+            owner = owners[i + 8]
+            if owner == OUTSIDE:
+                continue
+            enemy_x, enemy_y = x + 2 * dx, y + 2 * dy
+            enemy_unit = grids[owner].get_unit(enemy_x, enemy_y)
+
+        # add the attack as a message
+        if enemy_unit is not None and enemy_unit.faction != unit.faction:
+            air_messages.append((owner, {"x": enemy_x, "y": enemy_y, "damage": unit.attack}))
+
     return air_messages
 
 
 # simulate all possible movements of an air unit and return the best one
-def simulate_movement(unit, subgrid, neighbour_subgrids, rank, world_size , sqrt_p):
-    # get all possible movement positions for the unit
-    neighbors = []
-    neighbors.append((unit.x, unit.y))
-    neighbors += subgrid.get_all_neighbors(unit.x, unit.y)
+def simulate_movement(unit, subgrid, neighbour_subgrids, rank, partition):
+    owners = target_table(partition, rank, AirUnit.MOVES).owners_at(unit.x, unit.y)
+    grids = neighbour_subgrids + [subgrid]
     best_messages = []
     best_x, best_y = unit.x, unit.y
 
     # check each possible movement for the attacks
-    for x,y in neighbors:
-        
-        if x < 0 or y < 0 or x >= subgrid.get_size() * sqrt_p or y >= subgrid.get_size()* sqrt_p:
-            continue
+    for (dx, dy), owner in zip(AirUnit.MOVES, owners):
 
-        enemy_processor = get_processor_id(x, y, sqrt_p, subgrid.get_size())
+        if owner == OUTSIDE:
+            continue
 
-        # check if the enemy is in the same processor
-        if rank == enemy_processor:
-            if (x,y) != (unit.x, unit.y):
-                if subgrid.get_unit(x,y) is not None:
-                    continue
-        # check if the enemy is in a different processor        
-        else:
-            # check the relation between the processors
-            relation_index = neighbor_relation(rank, enemy_processor, sqrt_p)
-            if neighbour_subgrids[relation_index].get_unit(x, y) is not None:
-                continue
+        # the unit can only move to empty cells
+        x, y = unit.x + dx, unit.y + dy
+        if (dx, dy) != (0, 0) and grids[owner].get_unit(x, y) is not None:
+            continue
 
-        air_attack_pattern = unit.get_attack_pattern(x, y)
-        
         # get the attack pattern if unit moves to x,y
-        messages = get_air_attack_pattern(unit, air_attack_pattern, subgrid, neighbour_subgrids, rank, world_size , sqrt_p)
+        messages = get_air_attack_pattern(unit, x, y, subgrid, neighbour_subgrids, rank, partition)
 
         # if the attack pattern is better than the previous best, update the best
         if len(messages) > len(best_messages):
@@ -205,6 +96,53 @@ def simulate_movement(unit, subgrid, neighbour_subgrids, rank, world_size , sqrt
     return best_x, best_y, best_messages
 
 
+# find the first empty neighbour cell of every water unit of the subgrid for the flood at the end of the wave
+# returns the spawns in the same processor and the spawns of the neighbour processors by relation index
+def find_spawns(subgrid, neighbour_subgrids, rank, partition):
+    spawn_in_p = []
+    selected_spawns = [[] for i in range(8)]
+    table = target_table(partition, rank, NEIGHBOR_DIRECTIONS)
+    grids = neighbour_subgrids + [subgrid]
+
+    # iterate over all units in the subgrid and check if there is any water unit
+    for unit in subgrid.get_all_units():
+        if unit.faction == "Water":
+            for (dx, dy), owner in zip(NEIGHBOR_DIRECTIONS, table.owners_at(unit.x, unit.y)):
+                # check if the neighbor is out of the grid
+                if owner == OUTSIDE:
+                    continue
+                # if there is no unit in the neighbor, then spawn a new water unit
+                # in the same processor or in the neighbour processor of the relation index
+                neighbor = (unit.x + dx, unit.y + dy)
+                if grids[owner].get_unit(neighbor[0], neighbor[1]) is None:
+                    if owner == LOCAL:
+                        spawn_in_p.append(neighbor)
+                    else:
+                        selected_spawns[owner].append(neighbor)
+                    break
+    return spawn_in_p, selected_spawns
+
+
+# increase the attack power of the fire units of the subgrid for every enemy they attacked that died
+# neighbour_deaths are the death queues of the neighbour processors
+def resolve_rage(subgrid, neighbour_deaths, debug):
+    for fire_unit in subgrid.get_all_units():
+        if fire_unit.faction == "Fire":
+            attack = fire_unit.attack
+            for i in range(8):
+                for death in neighbour_deaths[i]:
+                    if death in fire_unit.attacked_to:
+                        fire_unit.increase_attack_power(debug)
+            for internal_death in subgrid.death_queue:
+                if internal_death in fire_unit.attacked_to:
+                    fire_unit.increase_attack_power(debug)
+            fire_unit.attacked_to = []
+            # one rage event per round with the new attack power, like the array engine
+            if events.LOG is not None and fire_unit.attack > attack:
+                events.LOG.record(events.RAGE, events.FACTIONS.index(fire_unit.faction), fire_unit.x, fire_unit.y,
+                                  value=fire_unit.attack, hp=fire_unit.hp)
+
+
 # initalize a new grid from an existing grid to be passed to a neighbor processor
 # num is the size of the new grid, num size of cols, rows or corner grids are passed
 
@@ -220,59 +158,26 @@ def split_grid(existing_grid, direction, num):
 # 6 : below right
 # 7 : above right
     
-    original_size = existing_grid.get_size()
-    new_offset_x, new_offset_y = existing_grid.offset_x, existing_grid.offset_y
-    new_grid_data = None
-
-    # split the grid in the specified direction
-
-    # split num amounts of rows to be passed above
-    if direction == 1:
-        new_grid_data = existing_grid.grid[:num, :]
-
-    # split num amounts of rows to be passed below
-    elif direction == 0:
-        new_grid_data = existing_grid.grid[-num:, :]
-        new_offset_y += (original_size - num)
-
-    # split num amounts of cols to be passed left
-    elif direction == 3:
-        new_grid_data = existing_grid.grid[:, :num]
-
-    # split num amounts of cols to be passed right
-    elif direction == 2:
-        new_grid_data = existing_grid.grid[:, -num:]
-        new_offset_x += (original_size - num)
-
-    # split num sized grid be passed above left
-    elif direction == 5:
-        new_grid_data = existing_grid.grid[:num, :num]
-
-    # split num sized grid be passed above right
-    elif direction == 7:
-        new_grid_data = existing_grid.grid[:num, -num:]
-        new_offset_x += (original_size - num)
-
-    # split num sized grid be passed below left
-    elif direction == 4:
-        new_grid_data = existing_grid.grid[-num:, :num]
-        new_offset_y += (original_size - num)
-
-    # split num sized grid be passed below right
-    elif direction == 6:
-        new_grid_data = existing_grid.grid[-num:, -num:]
-        new_offset_x += (original_size - num)
-        new_offset_y += (original_size - num)
-
-
-    # create the new grid instance
-    new_size = max(new_grid_data.shape)
-    new_grid = Grid(size=new_size, offset_x=new_offset_x, offset_y=new_offset_y, message_grid=True)
-
-    new_grid.grid = new_grid_data
-
-
-    return new_grid
+    width, height = existing_grid.get_size(), existing_grid.height
+    rows, cols = min(num, height), min(num, width)
+
+    # local window of the split in the specified direction, num rows, cols or a num sized corner
+    x, y, new_width, new_height = {
+        # num amounts of rows to be passed below or above
+        0: (0, height - rows, width, rows),
+        1: (0, 0, width, rows),
+        # num amounts of cols to be passed right or left
+        2: (width - cols, 0, cols, height),
+        3: (0, 0, cols, height),
+        # num sized corners to be passed below left, above left, below right or above right
+        4: (0, height - rows, cols, rows),
+        5: (0, 0, cols, rows),
+        6: (width - cols, height - rows, cols, rows),
+        7: (width - cols, 0, cols, rows),
+    }[direction]
+
+    # the new grid only carries the occupied cells of the window
+    return existing_grid.window(x, y, new_width, new_height)
 
 
 # initalize new grids from an existing grid to be passed to all  neighbor processor
@@ -283,4 +188,14 @@ def split_to_all(subgrid, num):
     for i in range(8):
         new_grids.append(split_grid(subgrid, i, num[i]))
 
-    return new_grids
\ No newline at end of file
+    return new_grids
+
+
+# print the final grid and write its rows to the output file
+def write_output(grid, output_file):
+    with open(output_file, "w") as f:
+        print("Final Output:")
+        display_rows = grid.display()
+        for row in display_rows:
+            f.write("".join(row))
+            f.write("\n")